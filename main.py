@@ -1,5 +1,157 @@
+"""Run the ER process mining pipeline: preprocess -> build log -> export -> analyses.
+
+    uv run main.py
+    uv run main.py --input data/raw/source_data.csv --output-dir output
+    uv run main.py --from-filtered data/raw/filtered_data.csv --only variants,dfg
+"""
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent / "scripts"))
+
+# pylint: disable=wrong-import-position
+from arrival_forecast import hourly_counts, rolling_statistics, update_profile
+from case_index import CaseIndex, build_case_index
+from data_profiler import DataProfile
+from figures import render_figures, standard_figures
+from log_analysis import directly_follows, lifecycle_duration_summary, variant_frequencies
+from mappings import MAPPINGS_ENV, load_mappings
+from pipeline import Stage, run_pipeline, select_stages
+import s01_data_preprocessing as s01
+import s02_generate_xes_log as s02
+
+
+def build_stages(args: argparse.Namespace) -> list[Stage]:
+    """Describe the pipeline as a DAG of stages."""
+    output_dir: Path = args.output_dir
+    reports_dir = output_dir / "reports"
+    log_xes = output_dir / "log.xes"
+    case_index_npz = output_dir / "case_index.npz"
+    mappings = load_mappings(args.mappings)
+
+    if args.from_filtered:
+        stages = [Stage("preprocess", lambda: s02.load_data(args.from_filtered))]
+    else:
+        def run_preprocess():
+            profile = DataProfile()
+            df = s01.preprocess(s01.load_data(args.input), profile, mappings)
+            profile.save(reports_dir)
+            return df
+
+        stages = [Stage("preprocess", run_preprocess)]
+        if args.filtered_csv:
+            stages.append(Stage(
+                "save_filtered",
+                lambda preprocess: s01.save_data(preprocess, args.filtered_csv),
+                ["preprocess"],
+            ))
+
+    def save_report(df, name: str) -> Path:
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        path = reports_dir / name
+        df.to_csv(path, index=False)
+        return path
+
+    def build_log(preprocess):
+        log = s02.build_event_log(preprocess, skip_invalid=True, mappings=mappings)
+        if log.skipped_cases:
+            print(f"Skipped {len(log.skipped_cases)} inconsistent cases")
+            save_report(log.skipped_cases_dataframe(), "skipped_cases.csv")
+        return log
+
+    def arrival_forecast(events):
+        hourly = hourly_counts(events, ["arrival_method", "severity"])
+        save_report(rolling_statistics(hourly).reset_index(), "arrival_rates.csv")
+        profile = update_profile(hourly, reports_dir / "arrival_profile.json")
+        return save_report(profile.forecast(horizon=168), "arrival_forecast.csv")
+
+    stages += [
+        Stage(
+            "case_index",
+            lambda preprocess: build_case_index(preprocess, mappings).save(case_index_npz),
+            ["preprocess"],
+        ),
+        Stage("build_log", build_log, ["preprocess"]),
+        Stage("events", lambda build_log: build_log.to_dataframe(), ["build_log"]),
+        Stage(
+            "activity_instances",
+            lambda build_log: build_log.activity_instances_dataframe(),
+            ["build_log"],
+        ),
+        Stage(
+            "export_xes",
+            lambda events: s02.write_xes(events, str(log_xes)),
+            ["events"],
+        ),
+        Stage(
+            "dfg",
+            lambda events: save_report(directly_follows(events), "directly_follows.csv"),
+            ["events"],
+        ),
+        Stage(
+            "variants",
+            lambda events: save_report(variant_frequencies(events), "variants.csv"),
+            ["events"],
+        ),
+        Stage(
+            "save_activity_instances",
+            lambda activity_instances: activity_instances.to_csv(
+                output_dir / "activity_instances.csv", index=False
+            ),
+            ["activity_instances"],
+        ),
+        Stage(
+            "service_times",
+            lambda activity_instances: save_report(
+                lifecycle_duration_summary(activity_instances), "service_times.csv"
+            ),
+            ["activity_instances"],
+        ),
+        Stage("arrival_forecast", arrival_forecast, ["events"]),
+        Stage(
+            "figures",
+            lambda export_xes, case_index: render_figures(
+                standard_figures(CaseIndex.load(case_index_npz)),
+                log_xes,
+                case_index_npz,
+                output_dir / "figures",
+                workers=args.render_workers,
+            ),
+            ["export_xes", "case_index"],
+        ),
+    ]
+    return stages
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=s01.INPUT_CSV, help="raw CSV export")
+    parser.add_argument("--from-filtered", type=Path,
+                        help="start from an already filtered CSV instead of the raw export")
+    parser.add_argument("--filtered-csv", type=Path, default=s01.OUTPUT_CSV,
+                        help="where to also save the filtered data")
+    parser.add_argument("--no-save-filtered", dest="filtered_csv", action="store_const", const=None,
+                        help="keep the filtered data in memory only")
+    parser.add_argument("--output-dir", type=Path, default=Path("output"))
+    parser.add_argument("--mappings", type=Path,
+                        help=f"hospital mapping tables (default: ${MAPPINGS_ENV} or config/mappings.json)")
+    parser.add_argument("--only", help="comma separated stages to run (with their dependencies)")
+    parser.add_argument("--workers", type=int, default=4, help="stages running at the same time")
+    parser.add_argument("--render-workers", type=int, default=4,
+                        help="processes rendering the figures")
+    return parser.parse_args()
+
+
 def main():
-    print("Hello from process-mining-project!")
+    """Entry point."""
+    args = parse_args()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    stages = build_stages(args)
+    if args.only:
+        stages = select_stages(stages, args.only.split(","))
+    run_pipeline(stages, max_workers=args.workers)
 
 
 if __name__ == "__main__":
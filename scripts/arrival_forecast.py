@@ -0,0 +1,227 @@
+"""Hourly arrival and discharge rates with an incremental hour-of-week forecast.
+
+Arrivals are the REGISTRATION events and discharges the DISCHARGE_EVENT
+events, split by arrival method and/or triage entry severity. The seasonal
+baseline only keeps per hour-of-week sums in its state file, so new days
+are absorbed without rescanning the history.
+
+    uv run scripts/arrival_forecast.py output/log.xes --by arrival_method severity
+    uv run scripts/arrival_forecast.py output/log.xes --horizon 48 --decay 0.9
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import json
+import numpy as np
+import pandas as pd
+
+from event_store import LOCAL_OFFSET_SECONDS, case_table, epoch_seconds
+from log_analysis import CASE_KEY, TIMESTAMP_KEY
+from xes_index import read_log
+
+ARRIVAL_PROFILE_JSON = Path("output/reports/arrival_profile.json")
+BIN_SECONDS = 3600
+HOURS_PER_WEEK = 168
+# Rolling windows, in bins
+ROLLING_WINDOWS = {"24h": 24, "7d": HOURS_PER_WEEK}
+# Grouping keys accepted by `hourly_counts`, as columns of the cases table
+GROUP_KEYS = {
+    "arrival_method": "arrival_method",
+    "severity": "triage_entry_severity",
+}
+# 1970-01-01 was a Thursday, day 3 of a week starting on Monday
+_EPOCH_WEEKDAY = 3
+
+
+def bin_counts(
+    seconds: np.ndarray, codes: np.ndarray, n_groups: int, start: float, n_bins: int,
+    bin_seconds: int = BIN_SECONDS,
+) -> np.ndarray:
+    """Count the events of every group in `n_bins` fixed intervals from `start`.
+
+    Returns a (n_bins, n_groups) array; events outside the bins are ignored.
+    """
+    edges = start + np.arange(n_bins + 1, dtype=np.float64) * bin_seconds
+    positions = np.searchsorted(edges, seconds, side="right") - 1
+    inside = (positions >= 0) & (positions < n_bins)
+    flat = positions[inside] * n_groups + codes[inside]
+    return np.bincount(flat, minlength=n_bins * n_groups).reshape(n_bins, n_groups)
+
+
+def hourly_counts(events: pd.DataFrame, by: list[str] | None = None) -> pd.DataFrame:
+    """Count arrivals and discharges per local hour and group.
+
+    The index holds the (local, naive) start of every hour between the first
+    and the last event, hours without events included; columns are
+    "arrivals|<group>" and "discharges|<group>".
+    """
+    by = by or []
+    events = events.assign(
+        ts=epoch_seconds(events[TIMESTAMP_KEY]), **{CASE_KEY: events[CASE_KEY].astype(str)}
+    )
+    cases = case_table(events)
+    if by:
+        labels = cases[[GROUP_KEYS[key] for key in by]].fillna("UNKNOWN").astype(str)
+        groups = labels.agg("/".join, axis=1)
+    else:
+        groups = pd.Series("ALL", index=cases.index)
+    codes, names = pd.factorize(groups, sort=True)
+
+    local = {
+        "arrivals": cases["registration_ts"].to_numpy(dtype=np.float64) + LOCAL_OFFSET_SECONDS,
+        "discharges": cases["discharge_ts"].to_numpy(dtype=np.float64) + LOCAL_OFFSET_SECONDS,
+    }
+    observed = np.concatenate([values[~np.isnan(values)] for values in local.values()])
+    start = np.floor(observed.min() / BIN_SECONDS) * BIN_SECONDS
+    n_bins = int((observed.max() - start) // BIN_SECONDS) + 1
+
+    frames = []
+    for kind, seconds in local.items():
+        known = ~np.isnan(seconds)
+        counts = bin_counts(seconds[known], codes[known], len(names), start, n_bins)
+        frames.append(pd.DataFrame(counts, columns=[f"{kind}|{name}" for name in names]))
+    index = pd.to_datetime(start + np.arange(n_bins) * BIN_SECONDS, unit="s")
+    return pd.concat(frames, axis=1).set_axis(index.rename("bin_start"))
+
+
+def rolling_statistics(counts: pd.DataFrame, windows: dict[str, int] | None = None) -> pd.DataFrame:
+    """Add the rolling mean and standard deviation of every series over `windows` bins."""
+    windows = windows or ROLLING_WINDOWS
+    frames = [counts]
+    for label, size in windows.items():
+        rolling = counts.rolling(size, min_periods=1)
+        frames.append(rolling.mean().add_suffix(f"|mean_{label}"))
+        frames.append(rolling.std().add_suffix(f"|std_{label}"))
+    return pd.concat(frames, axis=1)
+
+
+def hour_of_week(index: pd.DatetimeIndex) -> np.ndarray:
+    """Hour of the week (0 = Monday 00:00) of every timestamp."""
+    hours = index.to_numpy(dtype="datetime64[h]").astype(np.int64)
+    return (hours + _EPOCH_WEEKDAY * 24) % HOURS_PER_WEEK
+
+
+@dataclass
+class HourOfWeekProfile:
+    """Seasonal baseline: exponentially weighted count statistics per hour of the week.
+
+    Every series keeps, per hour of the week, the weight, sum and sum of
+    squares of the counts it has seen; older weeks are discounted by `decay`
+    (1.0 keeps the plain average). `end` is the first hour not absorbed yet.
+    """
+    decay: float = 1.0
+    end: pd.Timestamp | None = None
+    series: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def update(self, counts: pd.DataFrame, until: pd.Timestamp | None = None) -> int:
+        """Absorb the hourly bins between `end` and `until`; return how many were absorbed.
+
+        Only bins ending at or before `until` (local time) are complete. By
+        default the last bin is assumed partial, since the log ends within it,
+        and is left to the next update.
+        """
+        if counts.empty:
+            return 0
+        until = counts.index[-1] if until is None else pd.Timestamp(until).floor("h")
+        first = counts.index[0] if self.end is None else self.end
+        if until <= first:
+            return 0
+        # Hours without events up to the cutoff are zero counts
+        hours = pd.date_range(first, until - pd.Timedelta(seconds=BIN_SECONDS), freq="h")
+        counts = counts.reindex(hours, fill_value=0)
+
+        slots = hour_of_week(counts.index)
+        n_bins = len(counts)
+        # Weeks between every bin and the last bin of its slot
+        age = (n_bins - 1 - np.arange(n_bins)) // HOURS_PER_WEEK
+        weights = self.decay ** age
+        seen = np.bincount(slots, minlength=HOURS_PER_WEEK)
+        carry = self.decay ** seen
+
+        for name in counts.columns:
+            values = counts[name].to_numpy(dtype=np.float64)
+            state = self.series.setdefault(name, np.zeros((3, HOURS_PER_WEEK)))
+            state *= carry
+            state[0] += np.bincount(slots, weights=weights, minlength=HOURS_PER_WEEK)
+            state[1] += np.bincount(slots, weights=weights * values, minlength=HOURS_PER_WEEK)
+            state[2] += np.bincount(slots, weights=weights * values ** 2, minlength=HOURS_PER_WEEK)
+        self.end = until
+        return n_bins
+
+    def forecast(self, start: pd.Timestamp | None = None, horizon: int = 24) -> pd.DataFrame:
+        """Expected count and standard deviation of every series for `horizon` hours."""
+        start = self.end if start is None else start
+        index = pd.date_range(start, periods=horizon, freq="h", name="bin_start")
+        slots = hour_of_week(index)
+        rows = []
+        for name, (weight, total, squares) in self.series.items():
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = total[slots] / weight[slots]
+                variance = squares[slots] / weight[slots] - mean ** 2
+            kind, group = name.split("|", 1)
+            rows.append(pd.DataFrame({
+                "bin_start": index,
+                "kind": kind,
+                "group": group,
+                "expected": mean,
+                "std": np.sqrt(np.clip(variance, 0, None)),
+            }))
+        return pd.concat(rows, ignore_index=True)
+
+    def save(self, filepath: Path = ARRIVAL_PROFILE_JSON) -> None:
+        """Write the profile state as JSON."""
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(json.dumps({
+            "decay": self.decay,
+            "end": None if self.end is None else self.end.isoformat(),
+            "series": {name: state.tolist() for name, state in self.series.items()},
+        }))
+
+    @classmethod
+    def load(cls, filepath: Path = ARRIVAL_PROFILE_JSON) -> "HourOfWeekProfile":
+        """Read a profile saved with `save`."""
+        state = json.loads(filepath.read_text())
+        return cls(
+            decay=state["decay"],
+            end=None if state["end"] is None else pd.Timestamp(state["end"]),
+            series={name: np.array(values) for name, values in state["series"].items()},
+        )
+
+
+def update_profile(
+    counts: pd.DataFrame,
+    state_path: Path = ARRIVAL_PROFILE_JSON,
+    decay: float = 1.0,
+    until: pd.Timestamp | None = None,
+) -> HourOfWeekProfile:
+    """Load the saved profile (or start a new one), absorb `counts` and save it back."""
+    profile = HourOfWeekProfile.load(state_path) if state_path.exists() else HourOfWeekProfile(decay)
+    absorbed = profile.update(counts, until)
+    profile.save(state_path)
+    print(f"Absorbed {absorbed} new hours into {state_path}")
+    return profile
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", type=Path, help="XES log")
+    parser.add_argument("--by", nargs="*", choices=sorted(GROUP_KEYS), default=["arrival_method"])
+    parser.add_argument("--state", type=Path, default=ARRIVAL_PROFILE_JSON, help="profile state")
+    parser.add_argument("--decay", type=float, default=1.0, help="weekly decay of a new profile")
+    parser.add_argument("--horizon", type=int, default=24, help="hours to forecast")
+    parser.add_argument("--until", type=pd.Timestamp,
+                        help="local time up to which the log is complete (default: its last hour is not)")
+    parser.add_argument("--output-dir", type=Path, default=ARRIVAL_PROFILE_JSON.parent)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    hourly = hourly_counts(read_log(arguments.log), arguments.by)
+    arguments.output_dir.mkdir(parents=True, exist_ok=True)
+    rolling_statistics(hourly).to_csv(arguments.output_dir / "arrival_rates.csv")
+    baseline = update_profile(hourly, arguments.state, arguments.decay, arguments.until)
+    baseline.forecast(horizon=arguments.horizon).to_csv(
+        arguments.output_dir / "arrival_forecast.csv", index=False
+    )
@@ -0,0 +1,329 @@
+"""Benchmark the pipeline stages on seeded synthetic data.
+
+Every stage is timed on 10k, 100k and 1M raw rows (configurable) and its
+throughput and peak memory are compared against a stored baseline. The
+script exits with status 1 when a stage regresses beyond the threshold, or
+when the baseline is missing or lacks a measured size/stage (unless
+--allow-missing-baseline).
+
+    uv run scripts/benchmark.py --sizes 10k,100k --save-baseline
+    uv run scripts/benchmark.py --sizes 10k,100k
+"""
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from case_index import build_case_index
+from event_store import QUERIES, EventStore, pandas_query
+from s01_data_preprocessing import (
+    OUTCOME_MAP,
+    SEVERITY_MAP,
+    TEST_DEPARTMENT_RENAMING_MAPPING,
+    process_data,
+)
+from s02_generate_xes_log import build_event_log, get_unique_from_df, load_data
+
+BASELINE_JSON = Path("output/reports/benchmark_baseline.json")
+RESULTS_JSON = Path("output/reports/benchmark.json")
+DEFAULT_SIZES = "10k,100k,1M"
+DEFAULT_THRESHOLD = 0.2
+SEED = 42
+SQL_STAGES = ["sql_load", "sql_kpis", "pandas_kpis"]
+STAGES = [
+    "preprocess", "get_unique", "case_index", "build_log", "to_dataframe", "to_xes", *SQL_STAGES
+]
+
+ROWS_PER_CASE = 6
+REQUESTS_PER_CASE = 3
+LAB_SHARE = 0.6
+
+
+@dataclass
+class StageResult:
+    """Measurements of a single stage run."""
+    seconds: float
+    items: int
+    unit: str
+    peak_mb: float | None = None
+
+    @property
+    def throughput(self) -> float:
+        """Processed items per second."""
+        return self.items / self.seconds if self.seconds > 0 else float("inf")
+
+    def to_dict(self) -> dict:
+        """Serializable form stored in the results file."""
+        return {
+            "seconds": round(self.seconds, 4),
+            "items": self.items,
+            "unit": self.unit,
+            "throughput": round(self.throughput, 2),
+            "peak_mb": None if self.peak_mb is None else round(self.peak_mb, 2),
+        }
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes such as 10k or 1M."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    value = value.strip().lower()
+    if value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def _format_ts(values: np.ndarray) -> np.ndarray:
+    """Format datetime64 values the way the raw export does."""
+    return pd.DatetimeIndex(values).strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+
+
+def generate_raw_data(n_rows: int, seed: int = SEED) -> pd.DataFrame:
+    """Generate raw rows shaped like `data/raw/source_data.csv`."""
+    rng = np.random.default_rng(seed)
+    n_cases = max(n_rows // ROWS_PER_CASE, 1)
+    n_requests = n_cases * REQUESTS_PER_CASE
+
+    # Case level attributes
+    registration = (
+        np.datetime64("2023-01-01T00:00")
+        + rng.integers(0, 330 * 24 * 60, n_cases).astype("timedelta64[m]")
+    )
+    acceptancy = registration + rng.integers(5, 240, n_cases).astype("timedelta64[m]")
+    discharge = acceptancy + rng.integers(60, 900, n_cases).astype("timedelta64[m]")
+    severities = np.array(list(SEVERITY_MAP))
+    outcomes = np.array(list(OUTCOME_MAP))
+    arrival_methods = np.array(["AUTONOMO", "AMBULANZA 118", "ALTRO"])
+    age_groups = np.array(["0-17", "18-44", "45-64", "65-79", "80+"])
+    diagnosis_code = rng.integers(1000, 9999, n_cases).astype(float)
+    diagnosis_code[rng.random(n_cases) < 0.05] = np.nan
+    entry_severity = rng.choice(severities, n_cases)
+
+    # Request level attributes (tests and visits)
+    departments = np.array(list(TEST_DEPARTMENT_RENAMING_MAPPING))
+    weights = np.full(len(departments), (1 - LAB_SHARE) / (len(departments) - 1))
+    weights[list(departments).index("LAB. ANALISI")] = LAB_SHARE
+    request_case = np.arange(n_requests) // REQUESTS_PER_CASE
+    request_ts = acceptancy[request_case] + rng.integers(1, 60, n_requests).astype("timedelta64[m]")
+    planned_ts = request_ts + rng.integers(5, 180, n_requests).astype("timedelta64[m]")
+    request_department = rng.choice(departments, n_requests, p=weights)
+
+    # Row level: each row is a single service of a request
+    case = np.sort(rng.integers(0, n_cases, n_rows))
+    request = case * REQUESTS_PER_CASE + rng.integers(0, REQUESTS_PER_CASE, n_rows)
+
+    return pd.DataFrame({
+        "ID": case + 1,
+        "PS": np.where(rng.random(n_cases) < 0.95, "PS GENERALE", "PS PEDIATRICO")[case],
+        "Scheda_PS": case + 500_000,
+        "Sesso": rng.choice(["M", "F"], n_cases)[case],
+        "Data_Nascita": "1970-01-01",
+        "Comune_Res": "CASERTA",
+        "Regione_Res": "CAMPANIA",
+        "Mod_Arrivo": rng.choice(arrival_methods, n_cases)[case],
+        "Reparto": "PRONTO SOCCORSO",
+        "eta_paziente": rng.integers(0, 100, n_cases)[case],
+        "etapaziente_ric": rng.choice(age_groups, n_cases)[case],
+        "Triage_Ingr": entry_severity[case],
+        "Triage_OUT": np.where(
+            rng.random(n_cases) < 0.8, entry_severity, rng.choice(severities, n_cases)
+        )[case],
+        "Data_Arrivo": pd.DatetimeIndex(registration).strftime("%Y-%m-%d").to_numpy()[case],
+        "Ora_Arrivo": pd.DatetimeIndex(registration).strftime("%H:%M:%S").to_numpy()[case],
+        "Presa_In_Carico": _format_ts(acceptancy)[case],
+        "Data_Dimissione": pd.DatetimeIndex(discharge).strftime("%Y-%m-%d").to_numpy()[case],
+        "Ora_Dimissione": pd.DatetimeIndex(discharge).strftime("%H:%M:%S").to_numpy()[case],
+        "Esito": rng.choice(outcomes, n_cases)[case],
+        "Medico_Dimissione": "DOCTOR",
+        "Diag_TXT": "DIAGNOSIS",
+        "Diagnosi_Classe": "CLASS",
+        "Diagnosi_Codice": diagnosis_code[case],
+        "CODICE_RICHIESTA": request + 1_000_000,
+        "DESCR_PRESTAZIONE": rng.choice(["EMOCROMO", "GLUCOSIO", "RX TORACE", "VISITA"], n_rows),
+        "DESCR_EROGATORE": request_department[request],
+        "DATA_INSERIMENTO_RICHIESTA": _format_ts(request_ts)[request],
+        "DATA_PREVISTA_EROGAZIONE": _format_ts(planned_ts)[request],
+    })
+
+
+def measure(func, *args, memory: bool = True, repeat: int = 1):
+    """Time `func` (best of `repeat` runs) and, optionally, run it once more for peak memory."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def _get_unique_per_case(df: pd.DataFrame) -> None:
+    """Stage exercising `get_unique_from_df` on every case."""
+    for _, event_df in df.groupby("case_id"):
+        get_unique_from_df(event_df, "registration_ts")
+
+
+def _run_queries(run_query) -> None:
+    """Stage running every prepared KPI query."""
+    for name in QUERIES:
+        run_query(name)
+
+
+def run_size(
+    n_rows: int,
+    stages: list[str],
+    workdir: Path,
+    memory: bool,
+    repeat: int,
+) -> dict[str, StageResult]:
+    """Run the selected stages on `n_rows` synthetic raw rows."""
+    raw_csv = workdir / f"raw_{n_rows}.csv"
+    filtered_csv = workdir / f"filtered_{n_rows}.csv"
+    generate_raw_data(n_rows).to_csv(raw_csv, index=False)
+    results = {}
+
+    _, seconds, peak = measure(
+        process_data, raw_csv, filtered_csv, workdir, memory=memory, repeat=repeat
+    )
+    results["preprocess"] = StageResult(seconds, n_rows, "rows/s", peak)
+    filtered = load_data(filtered_csv)
+    n_cases = filtered["case_id"].nunique()
+
+    if "get_unique" in stages:
+        _, seconds, peak = measure(_get_unique_per_case, filtered, memory=memory, repeat=repeat)
+        results["get_unique"] = StageResult(seconds, len(filtered), "rows/s", peak)
+    if "case_index" in stages:
+        _, seconds, peak = measure(build_case_index, filtered, memory=memory, repeat=repeat)
+        results["case_index"] = StageResult(seconds, n_cases, "cases/s", peak)
+    if {"build_log", "to_dataframe", "to_xes", *SQL_STAGES} & set(stages):
+        log, seconds, peak = measure(build_event_log, filtered, memory=memory, repeat=repeat)
+        results["build_log"] = StageResult(seconds, n_cases, "cases/s", peak)
+        n_events = sum(len(c.events) for c in log.cases)
+        if "to_dataframe" in stages:
+            _, seconds, peak = measure(log.to_dataframe, memory=memory, repeat=repeat)
+            results["to_dataframe"] = StageResult(seconds, n_events, "events/s", peak)
+        if "to_xes" in stages:
+            xes_path = str(workdir / f"log_{n_rows}.xes")
+            _, seconds, peak = measure(log.to_xes, xes_path, memory=memory, repeat=repeat)
+            results["to_xes"] = StageResult(seconds, n_events, "events/s", peak)
+        if set(SQL_STAGES) & set(stages):
+            events = log.to_dataframe()
+            store = EventStore(workdir / f"events_{n_rows}.sqlite")
+            _, seconds, peak = measure(store.load_dataframe, events, memory=memory, repeat=repeat)
+            results["sql_load"] = StageResult(seconds, n_events, "events/s", peak)
+            _, seconds, peak = measure(_run_queries, store.query, memory=memory, repeat=repeat)
+            results["sql_kpis"] = StageResult(seconds, n_events, "events/s", peak)
+            _, seconds, peak = measure(
+                _run_queries, partial(pandas_query, events), memory=memory, repeat=repeat
+            )
+            results["pandas_kpis"] = StageResult(seconds, n_events, "events/s", peak)
+            store.close()
+    return {s: r for s, r in results.items() if s in stages}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Return the stages slower or bigger than the baseline, and those it does not cover."""
+    regressions, missing = [], []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if previous is None:
+                missing.append(f"{stage}@{size}")
+                continue
+            if current["throughput"] < previous["throughput"] * (1 - threshold):
+                regressions.append(
+                    f"{stage}@{size}: throughput {current['throughput']:.0f} "
+                    f"< baseline {previous['throughput']:.0f} {current['unit']}"
+                )
+            if (current["peak_mb"] is not None and previous.get("peak_mb") is not None
+                    and current["peak_mb"] > previous["peak_mb"] * (1 + threshold)):
+                regressions.append(
+                    f"{stage}@{size}: peak memory {current['peak_mb']:.1f} MB "
+                    f"> baseline {previous['peak_mb']:.1f} MB"
+                )
+    return regressions, missing
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated raw row counts")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma separated stages")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_JSON)
+    parser.add_argument("--output", type=Path, default=RESULTS_JSON)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative regression before failing")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="exit 0 when the baseline is missing or does not cover every size/stage")
+    parser.add_argument("--repeat", type=int, default=1, help="timing runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark and return the process exit code."""
+    args = parse_args()
+    stages = args.stages.split(",")
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {sorted(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(","):
+            n_rows = parse_size(size)
+            stage_results = run_size(
+                n_rows, stages, Path(workdir), not args.no_memory, args.repeat
+            )
+            results[str(n_rows)] = {s: r.to_dict() for s, r in stage_results.items()}
+            for stage, r in stage_results.items():
+                peak = "" if r.peak_mb is None else f", peak {r.peak_mb:.1f} MB"
+                print(f"{n_rows:>9} rows | {stage:<12} {r.seconds:8.2f}s "
+                      f"{r.throughput:12.0f} {r.unit}{peak}")
+
+    report = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": SEED,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline first.")
+        return 0 if args.allow_missing_baseline else 1
+
+    regressions, missing = compare(
+        results, json.loads(args.baseline.read_text())["results"], args.threshold
+    )
+    for stage in missing:
+        print(f"NO BASELINE {stage}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions or (missing and not args.allow_missing_baseline):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
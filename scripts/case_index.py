@@ -0,0 +1,205 @@
+"""Case-level attribute index used to slice the event log without re-filtering events."""
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from mappings import MappingRegistry, load_mappings
+
+CASE_INDEX_PATH = Path("output/case_index.npz")
+# One bit per department group in the uint32 department mask
+MAX_DEPARTMENT_GROUPS = 32
+
+# Columns of the filtered data stored as categorical codes
+CATEGORICAL_COLUMNS = [
+    "triage_entry_severity",
+    "triage_exit_severity",
+    "outcome_raw",
+    "arrival_method",
+    "age_group",
+]
+
+
+@dataclass
+class CaseIndex:
+    """Per-case attributes stored as aligned numpy arrays.
+
+    Position `i` in every array refers to the `i`-th case of the log, in the
+    same (sorted by case_id) order used by `s02_generate_xes_log`.
+    """
+    case_ids: np.ndarray
+    registration_ts: np.ndarray
+    codes: dict[str, np.ndarray]
+    categories: dict[str, np.ndarray]
+    department_groups: np.ndarray
+    department_mask: np.ndarray
+    # Fingerprint of the mapping tables that produced the filtered data
+    mappings_fingerprint: str = ""
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    def _match(self, column: str, values: str | list[str] | None) -> np.ndarray:
+        """Boolean mask of the cases whose `column` value is one of `values`."""
+        if values is None:
+            return np.ones(len(self), dtype=bool)
+        if isinstance(values, str):
+            values = [values]
+        wanted = np.flatnonzero(np.isin(self.categories[column], values))
+        return np.isin(self.codes[column], wanted)
+
+    def _department_bits(self, groups: str | list[str]) -> np.uint32:
+        """Bitmap with one bit set for each of the given department groups."""
+        if isinstance(groups, str):
+            groups = [groups]
+        bits = np.uint32(0)
+        for group in groups:
+            position = np.flatnonzero(self.department_groups == group)
+            if len(position) == 0:
+                raise KeyError(f"Unknown department group: {group}")
+            bits |= np.uint32(1) << np.uint32(position[0])
+        return bits
+
+    def mask(
+        self,
+        start: str | pd.Timestamp | None = None,
+        end: str | pd.Timestamp | None = None,
+        month: str | None = None,
+        entry_severity: str | list[str] | None = None,
+        exit_severity: str | list[str] | None = None,
+        outcome: str | list[str] | None = None,
+        arrival_method: str | list[str] | None = None,
+        age_group: str | list[str] | None = None,
+        department_groups: str | list[str] | None = None,
+    ) -> np.ndarray:
+        """Return a boolean mask of the cases matching all the given filters.
+
+        `start`/`end` bound the registration time (end excluded), `month` is a
+        shortcut such as "2023-05". `department_groups` keeps the cases that
+        touched at least one of the given groups.
+        """
+        result = np.ones(len(self), dtype=bool)
+        if month is not None:
+            period = pd.Period(month, freq="M")
+            start, end = period.start_time, (period + 1).start_time
+        if start is not None:
+            result &= self.registration_ts >= _to_ns(start)
+        if end is not None:
+            result &= self.registration_ts < _to_ns(end)
+        result &= self._match("triage_entry_severity", entry_severity)
+        result &= self._match("triage_exit_severity", exit_severity)
+        result &= self._match("outcome_raw", outcome)
+        result &= self._match("arrival_method", arrival_method)
+        result &= self._match("age_group", age_group)
+        if department_groups is not None:
+            bits = self._department_bits(department_groups)
+            result &= (self.department_mask & bits) != 0
+        return result
+
+    def select(self, **filters) -> np.ndarray:
+        """Return the case ids matching the given filters (see `mask`)."""
+        return self.case_ids[self.mask(**filters)]
+
+    def slice_log(self, log, mask: np.ndarray):
+        """Return an EventLog sharing the Case objects selected by `mask`.
+
+        Events are not copied: the returned log references the same cases.
+        """
+        log_ids = np.array([str(c.case_id) for c in log.cases])
+        if np.array_equal(log_ids, self.case_ids.astype(str)):
+            return type(log)(cases=[log.cases[i] for i in np.flatnonzero(mask)])
+        # Skipped cases or a log built from other rows: match them by id
+        selected = set(self.case_ids[mask].astype(str).tolist())
+        return type(log)(cases=[c for c, i in zip(log.cases, log_ids) if i in selected])
+
+    def slice_dataframe(self, df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+        """Return the rows of an event dataframe belonging to the selected cases."""
+        case_key = "case:concept:name" if "case:concept:name" in df.columns else "case_id"
+        # Case ids read back from XES are strings
+        selected = self.case_ids[mask].astype(str)
+        return df[df[case_key].astype(str).isin(selected)]
+
+    def save(self, filepath: Path) -> None:
+        """Store the index as a compressed numpy archive."""
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "case_ids": self.case_ids,
+            "registration_ts": self.registration_ts,
+            "department_groups": self.department_groups.astype(str),
+            "department_mask": self.department_mask,
+            "mappings_fingerprint": np.array(self.mappings_fingerprint),
+        }
+        for column in CATEGORICAL_COLUMNS:
+            arrays[f"codes:{column}"] = self.codes[column]
+            arrays[f"categories:{column}"] = self.categories[column].astype(str)
+        np.savez_compressed(filepath, **arrays)
+
+    @classmethod
+    def load(cls, filepath: Path) -> "CaseIndex":
+        """Load an index previously stored with `save`."""
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(
+                case_ids=data["case_ids"],
+                registration_ts=data["registration_ts"],
+                codes={c: data[f"codes:{c}"] for c in CATEGORICAL_COLUMNS},
+                categories={c: data[f"categories:{c}"] for c in CATEGORICAL_COLUMNS},
+                department_groups=data["department_groups"],
+                department_mask=data["department_mask"],
+                mappings_fingerprint=(
+                    str(data["mappings_fingerprint"]) if "mappings_fingerprint" in data else ""
+                ),
+            )
+
+
+def _to_ns(value: str | pd.Timestamp) -> int:
+    """Convert a timestamp to UTC nanoseconds, assuming the log time zone if naive."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("Etc/GMT-1")
+    return ts.value
+
+
+def build_case_index(df: pd.DataFrame, mappings: MappingRegistry | None = None) -> CaseIndex:
+    """Build the case index from the filtered data in a single groupby pass.
+
+    `mappings` are the tables the data was preprocessed with (default: `load_mappings()`).
+    """
+    grouped = df.groupby("case_id", sort=True)
+    first = grouped[CATEGORICAL_COLUMNS].first()
+    registration = pd.to_datetime(grouped["registration_ts"].min(), utc=True)
+
+    codes, categories = {}, {}
+    for column in CATEGORICAL_COLUMNS:
+        values = pd.Categorical(first[column].astype("string"))
+        codes[column] = values.codes.astype(np.int16)
+        categories[column] = np.asarray(values.categories, dtype=str)
+
+    # One bit per department group touched by the case, in configuration order
+    mappings = mappings or load_mappings()
+    known = mappings.group_names
+    extra = sorted(set(df["test_department_group"].dropna().astype(str)) - set(known))
+    groups = pd.Categorical(df["test_department_group"], categories=known + extra)
+    department_groups = np.asarray(groups.categories, dtype=str)
+    if len(department_groups) > MAX_DEPARTMENT_GROUPS:
+        raise ValueError(
+            f"{len(department_groups)} department groups, the bitmap holds {MAX_DEPARTMENT_GROUPS}"
+        )
+    case_positions = first.index.get_indexer(df["case_id"])
+    valid = groups.codes >= 0
+    bits = np.left_shift(np.uint32(1), groups.codes[valid].astype(np.uint32))
+    department_mask = np.zeros(len(first), dtype=np.uint32)
+    np.bitwise_or.at(department_mask, case_positions[valid], bits)
+
+    case_ids = first.index.to_numpy()
+    if case_ids.dtype == object:
+        case_ids = case_ids.astype(str)
+
+    return CaseIndex(
+        case_ids=case_ids,
+        registration_ts=registration.dt.as_unit("ns").astype("int64").to_numpy(),
+        codes=codes,
+        categories=categories,
+        department_groups=department_groups,
+        department_mask=department_mask,
+        mappings_fingerprint=mappings.fingerprint,
+    )
@@ -0,0 +1,86 @@
+"""Check the startup cost of the pipeline entry points with `python -X importtime`.
+
+Fails (exit status 1) when an entry point imports one of the heavy packages
+that must stay lazy, or when its total import time exceeds the budget.
+
+    uv run scripts/check_import_time.py
+    uv run scripts/check_import_time.py --budget 1.5
+"""
+from pathlib import Path
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = ROOT / "scripts"
+
+ENTRY_POINTS = [
+    "main",
+    "s01_data_preprocessing",
+    "s02_generate_xes_log",
+    "stream_monitor",
+    "xes_index",
+    "event_store",
+    "benchmark",
+    "figures",
+    "sampling",
+    "arrival_forecast",
+    "mappings",
+]
+
+# Packages only the XES export / discovery code paths may import
+LAZY_PACKAGES = {"pm4py", "scipy", "networkx", "lxml", "graphviz", "matplotlib"}
+
+DEFAULT_BUDGET_SECONDS = 3.0
+
+
+def measure_import(module: str) -> dict[str, float]:
+    """Import `module` in a fresh interpreter; return the self time (s) per top-level package."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT), str(SCRIPTS_DIR)]))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    per_package: dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        package = name.strip().split(".")[0]
+        per_package[package] = per_package.get(package, 0.0) + int(self_us) / 1e6
+    return per_package
+
+
+def check(module: str, budget: float) -> list[str]:
+    """Return the problems found for an entry point."""
+    per_package = measure_import(module)
+    total = sum(per_package.values())
+    heaviest = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:3]
+    print(f"{module:<24} {total:6.2f}s  (heaviest: "
+          + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in heaviest) + ")")
+
+    problems = [
+        f"{module} eagerly imports {package}"
+        for package in sorted(LAZY_PACKAGES & per_package.keys())
+    ]
+    if total > budget:
+        problems.append(f"{module} takes {total:.2f}s to import (budget {budget:.2f}s)")
+    return problems
+
+
+def main() -> int:
+    """Check every entry point and return the process exit code."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="maximum import time per entry point, in seconds")
+    args = parser.parse_args()
+
+    problems = [p for module in ENTRY_POINTS for p in check(module, args.budget)]
+    for problem in problems:
+        print(f"FAIL {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Data quality profile gathered while `s01_data_preprocessing.preprocess` runs."""
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import pandas as pd
+
+REPORTS_DIR = Path("output/reports")
+
+# (earlier, later): the first timestamp must precede the second one
+ORDERING_RULES = [
+    ("registration_ts", "triage_entry_ts"),
+    ("triage_entry_ts", "acceptancy_ts"),
+    ("acceptancy_ts", "triage_exit_ts"),
+    ("acceptancy_ts", "request_visit_ts"),
+    ("request_visit_ts", "test_planned_ts"),
+    ("outcome_ts", "discharge_ts"),
+]
+
+# Timestamps outside [start, end) are reported as out of range
+VALID_TIMESTAMP_RANGE = ("2023-01-01", "2024-01-01")
+
+
+@dataclass
+class DataProfile:
+    """Counters describing the quality of the raw data.
+
+    `checkpoint` is called after each filtering rule to count the cases it
+    dropped, `scan` computes the column statistics in one vectorized pass.
+    """
+    input_rows: int = 0
+    input_cases: int = 0
+    output_rows: int = 0
+    output_cases: int = 0
+    dropped_cases: dict[str, int] = field(default_factory=dict)
+    columns: dict[str, dict] = field(default_factory=dict)
+    ordering_violations: dict[str, dict] = field(default_factory=dict)
+    out_of_range: dict[str, int] = field(default_factory=dict)
+    mappings: dict = field(default_factory=dict)
+    _last_cases: int = 0
+
+    def start(self, df: pd.DataFrame, mappings: dict | None = None) -> None:
+        """Record the size of the data and the mapping version before any rule is applied."""
+        self.mappings = mappings or {}
+        self.input_rows = len(df)
+        self.input_cases = self._last_cases = df["case_id"].nunique()
+
+    def checkpoint(self, rule: str, df: pd.DataFrame) -> None:
+        """Record how many cases `rule` dropped."""
+        cases = df["case_id"].nunique()
+        self.dropped_cases[rule] = self._last_cases - cases
+        self._last_cases = self.output_cases = cases
+        self.output_rows = len(df)
+
+    def scan(self, df: pd.DataFrame) -> None:
+        """Compute null rates, distinct counts, ordering and range violations."""
+        null_rates = df.isna().mean()
+        distinct = df.nunique()
+        self.columns = {
+            column: {"null_rate": float(null_rates[column]), "distinct": int(distinct[column])}
+            for column in df.columns
+        }
+
+        for earlier, later in ORDERING_RULES:
+            if earlier not in df.columns or later not in df.columns:
+                continue
+            violated = df[earlier] >= df[later]
+            self.ordering_violations[f"{earlier} < {later}"] = {
+                "rows": int(violated.sum()),
+                "cases": int(df.loc[violated, "case_id"].nunique()),
+            }
+
+        start, end = VALID_TIMESTAMP_RANGE
+        for column in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+            values = df[column]
+            tz = values.dt.tz
+            lower = pd.Timestamp(start, tz=tz)
+            upper = pd.Timestamp(end, tz=tz)
+            self.out_of_range[column] = int(((values < lower) | (values >= upper)).sum())
+
+    def to_dict(self) -> dict:
+        """Return the profile as a JSON serializable dict."""
+        return {
+            "input_rows": self.input_rows,
+            "input_cases": self.input_cases,
+            "output_rows": self.output_rows,
+            "output_cases": self.output_cases,
+            "mappings": self.mappings,
+            "dropped_cases": self.dropped_cases,
+            "ordering_violations": self.ordering_violations,
+            "out_of_range_timestamps": self.out_of_range,
+            "columns": self.columns,
+        }
+
+    def to_html(self) -> str:
+        """Render the profile as a compact standalone HTML page."""
+        summary = pd.DataFrame([{
+            "input rows": self.input_rows,
+            "input cases": self.input_cases,
+            "output rows": self.output_rows,
+            "output cases": self.output_cases,
+        }])
+        sections = [
+            ("Summary", summary),
+            ("Mappings", pd.Series(self.mappings, name="value", dtype=object).to_frame()),
+            ("Dropped cases per rule", pd.Series(self.dropped_cases, name="cases").to_frame()),
+            ("Ordering violations", pd.DataFrame(self.ordering_violations).T),
+            ("Out of range timestamps", pd.Series(self.out_of_range, name="rows").to_frame()),
+            ("Columns", pd.DataFrame(self.columns).T),
+        ]
+        body = "\n".join(
+            f"<h2>{title}</h2>\n{table.to_html(float_format=lambda v: f'{v:.4f}')}"
+            for title, table in sections
+        )
+        return (
+            "<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Data quality</title></head>"
+            f"<body><h1>Data quality report</h1>\n{body}\n</body></html>\n"
+        )
+
+    def save(self, reports_dir: Path = REPORTS_DIR) -> None:
+        """Write data_quality.json and data_quality.html into `reports_dir`."""
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        (reports_dir / "data_quality.json").write_text(json.dumps(self.to_dict(), indent=2))
+        (reports_dir / "data_quality.html").write_text(self.to_html(), encoding="utf-8")
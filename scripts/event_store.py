@@ -0,0 +1,312 @@
+"""Embedded SQLite event store with prepared queries for the common ER KPIs.
+
+    uv run scripts/event_store.py output/log.xes --db output/events.sqlite
+    uv run scripts/event_store.py output/log.xes --db output/events.sqlite --compare
+"""
+from pathlib import Path
+import argparse
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+from log_analysis import ACTIVITY_KEY, CASE_KEY, TIMESTAMP_KEY
+from xes_index import read_log
+
+EVENT_STORE_PATH = Path("output/events.sqlite")
+BATCH_SIZE = 50_000
+# Timestamps are stored as UTC epoch seconds, the log is in Etc/GMT-1
+LOCAL_OFFSET_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    case_id TEXT PRIMARY KEY,
+    arrival_method TEXT,
+    triage_entry_severity TEXT,
+    triage_exit_severity TEXT,
+    outcome TEXT,
+    diagnosis_class TEXT,
+    registration_ts REAL,
+    discharge_ts REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    case_id TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    ts REAL NOT NULL,
+    lifecycle TEXT,
+    department TEXT,
+    code TEXT,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS events_case_ts ON events (case_id, ts);
+CREATE INDEX IF NOT EXISTS events_activity ON events (activity);
+"""
+
+# Event dataframe column -> events table column
+EVENT_COLUMNS = {
+    CASE_KEY: "case_id",
+    ACTIVITY_KEY: "activity",
+    TIMESTAMP_KEY: "ts",
+    "lifecycle:transition": "lifecycle",
+    "department": "department",
+    "code": "code",
+    "description": "description",
+}
+
+# Median of `value` per `grp` over a `samples(grp, value)` CTE
+_MEDIAN = """
+ranked AS (
+    SELECT grp, value,
+           ROW_NUMBER() OVER (PARTITION BY grp ORDER BY value) AS rn,
+           COUNT(*) OVER (PARTITION BY grp) AS n
+    FROM samples
+)
+SELECT grp, AVG(value) AS median_minutes, MAX(n) AS samples
+FROM ranked
+WHERE rn IN ((n + 1) / 2, (n + 2) / 2)
+GROUP BY grp
+ORDER BY grp
+"""
+
+QUERIES = {
+    # Waiting time between REGISTRATION and ACCEPTANCY per triage severity
+    "waiting_time_by_severity": """
+        WITH samples AS (
+            SELECT c.triage_entry_severity AS grp,
+                   (a.ts - c.registration_ts) / 60.0 AS value
+            FROM cases c JOIN events a ON a.case_id = c.case_id
+            WHERE a.activity = 'ACCEPTANCY'
+        ),""" + _MEDIAN,
+    # Length of stay (REGISTRATION -> DISCHARGE) per outcome
+    "length_of_stay_by_outcome": """
+        WITH samples AS (
+            SELECT outcome AS grp, (discharge_ts - registration_ts) / 60.0 AS value
+            FROM cases
+            WHERE discharge_ts IS NOT NULL
+        ),""" + _MEDIAN,
+    # Delay between REQUEST_VISIT_<group> and the start of VISIT_<group> per month
+    "request_to_visit_delay_by_month": """
+        WITH samples AS (
+            SELECT strftime('%Y-%m', r.ts + :offset, 'unixepoch') AS grp,
+                   (v.ts - r.ts) / 60.0 AS value
+            FROM events r JOIN events v
+              ON v.case_id = r.case_id AND v.code = r.code
+             AND v.activity = 'VISIT_' || :group AND v.lifecycle = 'start'
+            WHERE r.activity = 'REQUEST_VISIT_' || :group
+        ),""" + _MEDIAN,
+    # Registrations per local day
+    "daily_arrivals": """
+        SELECT date(ts + :offset, 'unixepoch') AS day, COUNT(*) AS arrivals
+        FROM events
+        WHERE activity = 'REGISTRATION'
+        GROUP BY day
+        ORDER BY day
+    """,
+}
+
+DEFAULT_PARAMETERS = {"offset": LOCAL_OFFSET_SECONDS, "group": "RADIOLOGY"}
+
+
+def epoch_seconds(values: pd.Series) -> pd.Series:
+    """Convert timestamps to UTC epoch seconds."""
+    return pd.to_datetime(values, utc=True).dt.as_unit("us").astype("int64") / 1e6
+
+
+def _first_per_case(df: pd.DataFrame, mask: pd.Series, column: str) -> pd.Series:
+    """Value of `column` on the first event matching `mask` of every case."""
+    return df.loc[mask].drop_duplicates(CASE_KEY).set_index(CASE_KEY)[column]
+
+
+def case_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive the cases table from the event dataframe."""
+    activity = df[ACTIVITY_KEY]
+    is_outcome = activity.str.startswith("OUTCOME_")
+    cases = pd.DataFrame({
+        "arrival_method": _first_per_case(df, activity == "REGISTRATION", "arrival_method"),
+        "triage_entry_severity": _first_per_case(
+            df, activity == "START_TRIAGE_ENTRY", "triage_entry_severity"),
+        "triage_exit_severity": _first_per_case(
+            df, activity == "START_TRIAGE_EXIT", "triage_exit_severity"),
+        "outcome": _first_per_case(df, is_outcome, ACTIVITY_KEY).str.removeprefix("OUTCOME_"),
+        "diagnosis_class": _first_per_case(df, activity == "DISCHARGE_EVENT", "diagnosis_class"),
+        "registration_ts": _first_per_case(df, activity == "REGISTRATION", "ts"),
+        "discharge_ts": _first_per_case(df, activity == "DISCHARGE_EVENT", "ts"),
+    })
+    return cases.rename_axis("case_id").reset_index()
+
+
+class EventStore:
+    """Event log stored in a local SQLite database."""
+
+    def __init__(self, filepath: Path = EVENT_STORE_PATH):
+        self.filepath = Path(filepath)
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.filepath)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def clear(self) -> None:
+        """Remove all the stored cases and events."""
+        with self.connection:
+            self.connection.execute("DELETE FROM events")
+            self.connection.execute("DELETE FROM cases")
+
+    def load_dataframe(self, df: pd.DataFrame, batch_size: int = BATCH_SIZE) -> int:
+        """Bulk load a flattened event dataframe, replacing the stored log.
+
+        Returns the number of events inserted.
+        """
+        df = df.copy()
+        df["ts"] = epoch_seconds(df[TIMESTAMP_KEY])
+        df[CASE_KEY] = df[CASE_KEY].astype(str)
+        events = pd.DataFrame({
+            target: df["ts"] if source == TIMESTAMP_KEY else df.get(source)
+            for source, target in EVENT_COLUMNS.items()
+        })
+        events = events.astype(object).where(events.notna(), None)
+        cases = case_table(df)
+        cases = cases.astype(object).where(cases.notna(), None)
+
+        insert_events = (f"INSERT INTO events ({', '.join(events.columns)}) "
+                         f"VALUES ({', '.join('?' * len(events.columns))})")
+        insert_cases = (f"INSERT INTO cases ({', '.join(cases.columns)}) "
+                        f"VALUES ({', '.join('?' * len(cases.columns))})")
+        self.clear()
+        with self.connection:
+            # Indexes are rebuilt once at the end instead of on every insert
+            self.connection.execute("DROP INDEX IF EXISTS events_case_ts")
+            self.connection.execute("DROP INDEX IF EXISTS events_activity")
+            self.connection.executemany(insert_cases, cases.itertuples(index=False, name=None))
+            for start in range(0, len(events), batch_size):
+                batch = events.iloc[start:start + batch_size]
+                self.connection.executemany(insert_events, batch.itertuples(index=False, name=None))
+            self.connection.executescript(SCHEMA)
+        self.connection.execute("ANALYZE")
+        return len(events)
+
+    def load_event_log(self, log, batch_size: int = BATCH_SIZE) -> int:
+        """Bulk load an `EventLog`."""
+        return self.load_dataframe(log.to_dataframe(), batch_size)
+
+    def query(self, name: str, **parameters) -> pd.DataFrame:
+        """Run one of the prepared `QUERIES`."""
+        sql = QUERIES[name]
+        parameters = {**DEFAULT_PARAMETERS, **parameters}
+        used = {k: v for k, v in parameters.items() if f":{k}" in sql}
+        return pd.read_sql_query(sql, self.connection, params=used)
+
+
+def _median_by(samples: pd.DataFrame) -> pd.DataFrame:
+    """Pandas counterpart of the `_MEDIAN` SQL fragment."""
+    return (
+        samples.groupby("grp")["value"]
+        .agg(median_minutes="median", samples="size")
+        .reset_index()
+    )
+
+
+def pandas_query(df: pd.DataFrame, name: str, **parameters) -> pd.DataFrame:
+    """Compute a prepared query with pandas on the event dataframe."""
+    parameters = {**DEFAULT_PARAMETERS, **parameters}
+    df = df.assign(ts=epoch_seconds(df[TIMESTAMP_KEY]), **{CASE_KEY: df[CASE_KEY].astype(str)})
+    cases = case_table(df)
+    activity = df[ACTIVITY_KEY]
+    local = pd.to_datetime(df["ts"] + parameters["offset"], unit="s")
+
+    if name == "waiting_time_by_severity":
+        accepted = df.loc[activity == "ACCEPTANCY", [CASE_KEY, "ts"]].merge(
+            cases, left_on=CASE_KEY, right_on="case_id")
+        return _median_by(pd.DataFrame({
+            "grp": accepted["triage_entry_severity"],
+            "value": (accepted["ts"] - accepted["registration_ts"]) / 60,
+        }))
+    if name == "length_of_stay_by_outcome":
+        stays = cases.dropna(subset=["discharge_ts"])
+        return _median_by(pd.DataFrame({
+            "grp": stays["outcome"],
+            "value": (stays["discharge_ts"] - stays["registration_ts"]) / 60,
+        }))
+    if name == "request_to_visit_delay_by_month":
+        group = parameters["group"]
+        requests = df.loc[activity == f"REQUEST_VISIT_{group}", [CASE_KEY, "code", "ts"]]
+        requests = requests.assign(grp=local[requests.index].dt.strftime("%Y-%m"))
+        visits = df.loc[
+            (activity == f"VISIT_{group}") & (df["lifecycle:transition"] == "start"),
+            [CASE_KEY, "code", "ts"],
+        ]
+        pairs = requests.merge(visits, on=[CASE_KEY, "code"], suffixes=("_request", "_visit"))
+        return _median_by(pd.DataFrame({
+            "grp": pairs["grp"],
+            "value": (pairs["ts_visit"] - pairs["ts_request"]) / 60,
+        }))
+    if name == "daily_arrivals":
+        days = local[activity == "REGISTRATION"].dt.strftime("%Y-%m-%d")
+        return days.value_counts().sort_index().rename_axis("day").rename("arrivals").reset_index()
+    raise KeyError(f"Unknown query: {name}")
+
+
+def results_match(sql_result: pd.DataFrame, pandas_result: pd.DataFrame) -> bool:
+    """Check that two results of a query have the same keys and values."""
+    key = sql_result.columns[0]
+    if list(sql_result.columns) != list(pandas_result.columns) or len(sql_result) != len(pandas_result):
+        return False
+    merged = sql_result.assign(**{key: sql_result[key].astype(str)}).merge(
+        pandas_result.assign(**{key: pandas_result[key].astype(str)}),
+        on=key, how="outer", suffixes=("_sql", "_pandas"), indicator=True,
+    )
+    if not (merged["_merge"] == "both").all():
+        return False
+    return all(
+        np.isclose(
+            merged[f"{column}_sql"].to_numpy(dtype=np.float64),
+            merged[f"{column}_pandas"].to_numpy(dtype=np.float64),
+            equal_nan=True,
+        ).all()
+        for column in sql_result.columns[1:]
+    )
+
+
+def compare_with_pandas(store: EventStore, df: pd.DataFrame) -> pd.DataFrame:
+    """Time every prepared query against its pandas counterpart."""
+    rows = []
+    for name in QUERIES:
+        start = time.perf_counter()
+        sql_result = store.query(name)
+        sql_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        pandas_result = pandas_query(df, name)
+        pandas_seconds = time.perf_counter() - start
+        rows.append({
+            "query": name,
+            "sql_seconds": sql_seconds,
+            "pandas_seconds": pandas_seconds,
+            "results_match": results_match(sql_result, pandas_result),
+        })
+    return pd.DataFrame(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", type=Path, help="XES log to load")
+    parser.add_argument("--db", type=Path, default=EVENT_STORE_PATH)
+    parser.add_argument("--compare", action="store_true",
+                        help="time the prepared queries against pandas")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    events_df = read_log(arguments.log)
+    event_store = EventStore(arguments.db)
+    started = time.perf_counter()
+    loaded = event_store.load_dataframe(events_df)
+    print(f"Loaded {loaded} events in {time.perf_counter() - started:.1f}s into {arguments.db}")
+    for query_name in QUERIES:
+        print(f"\n{query_name}\n{event_store.query(query_name).to_string(index=False)}")
+    if arguments.compare:
+        print(f"\n{compare_with_pandas(event_store, events_df).to_string(index=False)}")
+    event_store.close()
@@ -0,0 +1,169 @@
+"""Render the standard process maps into output/figures, skipping up-to-date ones.
+
+Every figure is memoized on (log fingerprint, slice, algorithm, parameters):
+the key is stored in `output/figures/manifest.json` and the figure is only
+rediscovered and re-rendered when the key changes or the file is missing.
+Figures are rendered in parallel worker processes, started with "spawn"
+since the caller may be multi-threaded (the `main.py` pipeline).
+
+    uv run scripts/figures.py
+    uv run scripts/figures.py --workers 8 --force
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import multiprocessing
+
+from case_index import CASE_INDEX_PATH, CaseIndex
+from xes_index import read_log
+
+FIGURES_DIR = Path("output/figures")
+LOG_XES = Path("output/log.xes")
+MANIFEST_NAME = "manifest.json"
+FIGURE_FORMAT = "png"
+
+
+@dataclass(frozen=True)
+class FigureSpec:
+    """A figure: which cases (CaseIndex.mask filters), which algorithm, which parameters."""
+    name: str
+    algorithm: str
+    slice: dict = field(default_factory=dict)
+    parameters: dict = field(default_factory=dict)
+
+    def key(self, log_fingerprint: str) -> str:
+        """Memoization key of the figure."""
+        content = json.dumps(
+            [log_fingerprint, self.algorithm, self.slice, self.parameters],
+            sort_keys=True,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @property
+    def filename(self) -> str:
+        """Name of the rendered file."""
+        return f"{self.name}.{FIGURE_FORMAT}"
+
+
+def fingerprint_file(filepath: Path, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def standard_figures(index: CaseIndex) -> list[FigureSpec]:
+    """The figures regenerated by default."""
+    specs = [
+        FigureSpec(f"dfg_{severity.lower()}", "dfg", {"entry_severity": str(severity)})
+        for severity in index.categories["triage_entry_severity"]
+    ]
+    specs += [
+        FigureSpec("dfg_all", "dfg"),
+        FigureSpec("performance_dfg_all", "performance_dfg"),
+        FigureSpec("petri_inductive", "inductive", parameters={"noise_threshold": 0.2}),
+        FigureSpec("petri_heuristics", "heuristics", parameters={"dependency_threshold": 0.9}),
+    ]
+    return specs
+
+
+def render_figure(spec: FigureSpec, log_path: Path, index_path: Path, output_path: Path) -> Path:
+    """Discover the model of a figure and render it (runs in a worker process)."""
+    # pm4py is slow to import, only the workers need it
+    import pm4py  # pylint: disable=import-outside-toplevel
+
+    events = read_log(log_path)
+    if spec.slice:
+        index = CaseIndex.load(index_path)
+        events = index.slice_dataframe(events, index.mask(**spec.slice))
+
+    if spec.algorithm == "dfg":
+        dfg, start_activities, end_activities = pm4py.discover_dfg(events)
+        pm4py.save_vis_dfg(dfg, start_activities, end_activities, str(output_path))
+    elif spec.algorithm == "performance_dfg":
+        dfg, start_activities, end_activities = pm4py.discover_performance_dfg(events)
+        pm4py.save_vis_performance_dfg(dfg, start_activities, end_activities, str(output_path))
+    elif spec.algorithm == "inductive":
+        net, im, fm = pm4py.discover_petri_net_inductive(events, **spec.parameters)
+        pm4py.save_vis_petri_net(net, im, fm, str(output_path))
+    elif spec.algorithm == "heuristics":
+        net, im, fm = pm4py.discover_petri_net_heuristics(events, **spec.parameters)
+        pm4py.save_vis_petri_net(net, im, fm, str(output_path))
+    else:
+        raise ValueError(f"Unknown algorithm: {spec.algorithm}")
+    return output_path
+
+
+def render_figures(
+    specs: list[FigureSpec],
+    log_path: Path = LOG_XES,
+    index_path: Path = CASE_INDEX_PATH,
+    figures_dir: Path = FIGURES_DIR,
+    workers: int = 4,
+    force: bool = False,
+) -> list[Path]:
+    """Render the out-of-date figures in parallel; return the rendered paths."""
+    figures_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = figures_dir / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    # Slices depend on the case index as well as on the log
+    log_fingerprint = fingerprint_file(log_path)
+    if index_path.exists():
+        log_fingerprint += ":" + fingerprint_file(index_path)
+
+    stale = [
+        spec for spec in specs
+        if force
+        or manifest.get(spec.filename) != spec.key(log_fingerprint)
+        or not (figures_dir / spec.filename).exists()
+    ]
+    print(f"{len(specs) - len(stale)} figures up to date, {len(stale)} to render")
+    if not stale:
+        return []
+
+    # Build the columnar cache once before the workers read it
+    read_log(log_path)
+
+    rendered = []
+    # Forking a multi-threaded process can deadlock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(render_figure, spec, log_path, index_path, figures_dir / spec.filename): spec
+            for spec in stale
+        }
+        for future in as_completed(futures):
+            spec = futures[future]
+            rendered.append(future.result())
+            manifest[spec.filename] = spec.key(log_fingerprint)
+            manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+            print(f"Rendered {spec.filename}")
+    return rendered
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", type=Path, default=LOG_XES)
+    parser.add_argument("--index", type=Path, default=CASE_INDEX_PATH)
+    parser.add_argument("--output-dir", type=Path, default=FIGURES_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="re-render every figure")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    render_figures(
+        standard_figures(CaseIndex.load(arguments.index)),
+        arguments.log,
+        arguments.index,
+        arguments.output_dir,
+        arguments.workers,
+        arguments.force,
+    )
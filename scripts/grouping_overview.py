@@ -1,14 +1,26 @@
 """
 Visits Grouping Overview
+
+The tables are derived from the shared mapping registry (config/mappings.json),
+so they always match the names used by the preprocessing.
 """
+from mappings import load_mappings
+
+MAPPINGS = load_mappings()
+
+
+def _group(name: str) -> dict[str, str]:
+    """Raw department name -> translated name of the departments of a group."""
+    codes = set(MAPPINGS.department_groups[name])
+    return {raw: code for raw, code in MAPPINGS.department_names.items() if code in codes}
+
+
 # ==============================================
 # 1. TESTS
 # Departments related to laboratory analysis and high-volume test data.
 # This group makes up the majority of the dataset and is kept separate for clarity.
 # ==============================================
-TESTS = {
-    'LAB. ANALISI': 'TEST',
-}
+TESTS = _group("TESTS")
 
 
 # ==============================================
@@ -16,10 +28,7 @@ TESTS = {
 # Imaging-based diagnostic departments including radiology and neuroradiology.
 # These represent a significant portion of hospital activity (≈10%) and are analyzed independently.
 # ==============================================
-RADIOLOGY = {
-    'RADIOLOGIA': 'RADIOLOGY_DEPT',
-    'U.O.S.D. NEURORADIOLOGIA': 'NEURORADIOLOGY',
-}
+RADIOLOGY = _group("RADIOLOGY")
 
 # ==============================================
 # 3. SPECIALTY DIAGNOSTIC / INTERVENTIONAL / MEDICAL
@@ -27,31 +36,13 @@ RADIOLOGY = {
 # These cover most of the hospital’s diagnostic and specialty services and also
 # treatment and administration of medicines
 # ==============================================
-MEDICAL = {
-    'GASTROENTEROLOGIA - AMBULATORIO': 'GASTROENTEROLOGY',
-    'NEFROLOGIA - AMBULATORIO': 'NEPHROLOGY',
-    'DERMATOLOGIA E MALATTIE VENEREE - AMBULATORIO': 'DERMATOLOGY',
-    'MEDICINA INTERNA - AMBULATORIO': 'INTERNAL_MEDICINE',
-    'NEUROLOGIA - AMBULATORIO': 'NEUROLOGY',
-    'PNEUMOLOGIA FISIOPATOLOGIA RESPIRATORIA - AMBULATORIO': 'PULMONOLOGY',
-    'REPARTO AMBULATORIALE ALLERGOLOGIA': 'ALLERGOLOGY_AMB',
-    "CARDIOLOGIA D'EMERGENZA CON UTIC - AMBULATORIO": 'EMERGENCY_CARDIOLOGY_UTIC',
-    'MALATTIE INFETTIVE E TROPICALI A DIREZIONE UNIVERSITARIA - AMBULATORIO - EROGAZIONE FARMACI PER ESTERNI': 'INFECTIOUS_DISEASES_PHARMACY',
-    'Eliot':'ELIOT_TRANSFUSION'
-}
+MEDICAL = _group("MEDICAL")
 
 # ==============================================
 # 4. SURGICAL / VASCULAR / ANESTESIA
 # Departments responsible for surgical interventions or vascular procedures.
 # ==============================================
-SURGERY = {
-    'NEUROCHIRURGIA - AMBULATORIO': 'NEUROSURGERY',
-    'ORTOPEDIA E TRAUMATOLOGIA - AMBULATORIO': 'ORTHOPEDICS_TRAUMA',
-    'OTORINOLARINGOIATRIA - AMBULATORIO': 'ENT_OTOLARYNGOLOGY',
-    'UROLOGIA - AMBULATORIO': 'UROLOGY',
-    'REPARTO AMBULATORIALE CHIRURGIA VASCOLARE': 'VASCULAR_SURGERY_AMB',
-    'REPARTO AMBULATORIALE CH.MAX.ODONTOST.': 'MAXILLOFACIAL_SURGERY_AMB'
-}
+SURGERY = _group("SURGERY")
 # Note from domain expert: Given the nature of the emergency room, probably only surgical consultations, which means that our patient will most likely have this procedure linked to their
 # discharge from the relevant medical department, with a small possibility of microsurgery in the ER
 
@@ -59,20 +50,14 @@ SURGERY = {
 # 5. Intensive practices
 # Only one category, grouping all cases related to anesthesia & resuscination.
 # ==============================================
-INTENSIVE = {
-    'REPARTO AMBULATORIALE ANESTESIA E RIANIMAZIONE': 'ANESTHESIA_RESUSCITATION_AMB',
-}
+INTENSIVE = _group("INTENSIVE")
 
 # ==============================================
 # 6. ONCOLOGY
 # All oncology-related activities, including surgical, hematologic,
 # and general outpatient oncology departments.
 # ==============================================
-ONCOLOGY = {
-    'REPARTO AMBULATORIALE ONCOLOGIA': 'ONCOLOGY_GENERAL',
-    'CHIRURGIA GENERALE ED ONCOLOGICA - AMBULATORIO': 'ONCOLOGY_SURGERY',
-    'EMATOLOGIA AD INDIRIZZO ONCOLOGICO - AMBULATORIO': 'ONCOLOGY_HEMATOLOGY',
-}
+ONCOLOGY = _group("ONCOLOGY")
 
 
 # ==============================================
@@ -80,6 +65,4 @@ ONCOLOGY = {
 # Departments focused on patient monitoring and post-acute care.
 # Includes long-term management and post-surgical follow-ups.
 # ==============================================
-FOLLOW_UP = {
-    'FOLLOW UP DEL PAZIENTE POST ACUTO - AMBULATORIO': 'POST_ACUTE_FOLLOW_UP',
-}
+FOLLOW_UP = _group("FOLLOW_UP")
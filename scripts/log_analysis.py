@@ -0,0 +1,61 @@
+"""Lightweight analyses on the flattened event dataframe (`EventLog.to_dataframe()`)."""
+import pandas as pd
+
+CASE_KEY = "case:concept:name"
+ACTIVITY_KEY = "concept:name"
+TIMESTAMP_KEY = "time:timestamp"
+
+
+def _sorted_events(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort the events by case and timestamp, keeping the original order on ties."""
+    return df.sort_values([CASE_KEY, TIMESTAMP_KEY], kind="stable")
+
+
+def directly_follows(df: pd.DataFrame) -> pd.DataFrame:
+    """Count the directly-follows relations between activities."""
+    events = _sorted_events(df)
+    following = events[ACTIVITY_KEY].shift(-1)
+    same_case = events[CASE_KEY].eq(events[CASE_KEY].shift(-1))
+    edges = pd.DataFrame({
+        "source": events.loc[same_case, ACTIVITY_KEY],
+        "target": following[same_case],
+    })
+    return (
+        edges.value_counts()
+        .rename("frequency")
+        .reset_index()
+        .sort_values("frequency", ascending=False, ignore_index=True)
+    )
+
+
+def case_variants(df: pd.DataFrame) -> pd.Series:
+    """Return the variant (comma separated activities) of every case."""
+    events = _sorted_events(df)
+    return events.groupby(CASE_KEY, sort=False)[ACTIVITY_KEY].agg(",".join)
+
+
+def variant_frequencies(df: pd.DataFrame) -> pd.DataFrame:
+    """Count the cases of every variant."""
+    return (
+        case_variants(df)
+        .value_counts()
+        .rename_axis("variant")
+        .rename("cases")
+        .reset_index()
+    )
+
+
+def lifecycle_duration_summary(instances: pd.DataFrame) -> pd.DataFrame:
+    """Summarize waiting and service times (minutes) of the activity instances table."""
+    return (
+        instances.groupby(["activity", "department_group"])
+        .agg(
+            instances=("activity", "size"),
+            clamped_share=("start_clamped", "mean"),
+            waiting_median=("waiting_time", "median"),
+            waiting_p90=("waiting_time", lambda s: s.quantile(0.9)),
+            service_median=("service_time", "median"),
+            service_p90=("service_time", lambda s: s.quantile(0.9)),
+        )
+        .reset_index()
+    )
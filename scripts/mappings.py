@@ -0,0 +1,166 @@
+"""Hospital specific mapping tables, loaded once from a versioned config file.
+
+The default tables live in `config/mappings.json`; another hospital's
+tables are used by pointing the `ER_MAPPINGS` environment variable to a
+file with the same layout. Every lookup is compiled once into arrays and
+the registry exposes a fingerprint of the content that produced the outputs.
+
+    uv run scripts/mappings.py
+    ER_MAPPINGS=config/other_hospital.json uv run scripts/mappings.py
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+MAPPINGS_JSON = Path(__file__).resolve().parent.parent / "config" / "mappings.json"
+MAPPINGS_ENV = "ER_MAPPINGS"
+SUPPORTED_VERSIONS = {1}
+
+
+def normalize_label(value: str) -> str:
+    """Collapse repeated and surrounding whitespace of a raw label."""
+    return " ".join(value.split())
+
+
+@dataclass(frozen=True)
+class Lookup:
+    """A mapping compiled into a key index and an array of values.
+
+    Values are looked up once per distinct input label (after whitespace
+    normalization) and then broadcast to the rows.
+    """
+    keys: pd.Index
+    values: np.ndarray
+
+    @classmethod
+    def compile(cls, mapping: dict) -> "Lookup":
+        """Compile a {raw label: value} dict."""
+        values = np.empty(len(mapping) + 1, dtype=object)
+        values[:-1] = list(mapping.values())
+        values[-1] = np.nan
+        return cls(pd.Index([normalize_label(k) for k in mapping]), values)
+
+    def map(self, labels: pd.Series, keep_unmapped: bool = False) -> pd.Series:
+        """Translate `labels`; unknown labels become NaN or are kept as they are."""
+        codes, uniques = pd.factorize(labels)
+        normalized = [normalize_label(u) if isinstance(u, str) else u for u in uniques]
+        # -1 (not found / missing) selects the trailing NaN
+        translated = self.values[self.keys.get_indexer(normalized)]
+        if keep_unmapped:
+            translated = translated.copy()
+            unknown = pd.isna(translated)
+            translated[unknown] = np.asarray(uniques, dtype=object)[unknown]
+        result = np.append(translated, np.nan)[codes]
+        # Same dtypes as `Series.map(dict)`: int if every row is mapped, else float
+        return pd.Series(result, index=labels.index, name=labels.name).infer_objects()
+
+
+@dataclass(frozen=True)
+class MappingRegistry:
+    """Compiled mapping tables of one hospital."""
+    source: Path
+    version: int
+    hospital: str
+    fingerprint: str
+    emergency_room: str
+    laboratory_department: str
+    excluded_departments: list[str]
+    columns: dict[str, str]
+    department_names: dict[str, str]
+    department_groups: dict[str, list[str]]
+    department_average_time: dict[str, int]
+    outcomes: dict[str, str]
+    severities: dict[str, str]
+    department_lookup: Lookup
+    group_lookup: Lookup
+    average_time_lookup: Lookup
+    outcome_lookup: Lookup
+    severity_lookup: Lookup
+
+    @property
+    def group_names(self) -> list[str]:
+        """Department groups in configuration order."""
+        return list(self.department_groups)
+
+    def describe(self) -> dict:
+        """Identify the mapping version in reports."""
+        return {
+            "source": str(self.source),
+            "version": self.version,
+            "hospital": self.hospital,
+            "fingerprint": self.fingerprint,
+        }
+
+
+def compile_mappings(config: dict, source: Path) -> MappingRegistry:
+    """Validate the raw config and compile its lookups."""
+    if config.get("version") not in SUPPORTED_VERSIONS:
+        raise ValueError(f"{source}: unsupported mappings version {config.get('version')!r}")
+    departments = config["test_departments"]
+    groups = {group: [] for group in config["department_groups"]}
+    for department in departments:
+        if department["group"] not in groups:
+            raise ValueError(f"{source}: {department['code']} has unknown group {department['group']!r}")
+        groups[department["group"]].append(department["code"])
+    names = {d["name"]: d["code"] for d in departments}
+    if len({normalize_label(name) for name in names}) != len(departments):
+        raise ValueError(f"{source}: duplicate department names")
+    if config["laboratory_department"] not in names.values():
+        raise ValueError(f"{source}: unknown laboratory department {config['laboratory_department']!r}")
+
+    average_time = {d["code"]: d["average_time"] for d in departments}
+    group_of = {code: group for group, codes in groups.items() for code in codes}
+    content = json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return MappingRegistry(
+        source=source,
+        version=config["version"],
+        hospital=config["hospital"],
+        fingerprint=hashlib.sha256(content.encode("utf-8")).hexdigest(),
+        emergency_room=config["emergency_room"],
+        laboratory_department=config["laboratory_department"],
+        excluded_departments=config["excluded_departments"],
+        columns=config["columns"],
+        department_names=names,
+        department_groups=groups,
+        department_average_time=average_time,
+        outcomes=config["outcomes"],
+        severities=config["severities"],
+        department_lookup=Lookup.compile(names),
+        group_lookup=Lookup.compile(group_of),
+        average_time_lookup=Lookup.compile(average_time),
+        outcome_lookup=Lookup.compile(config["outcomes"]),
+        severity_lookup=Lookup.compile(config["severities"]),
+    )
+
+
+@lru_cache(maxsize=None)
+def _load(filepath: Path) -> MappingRegistry:
+    return compile_mappings(json.loads(filepath.read_text(encoding="utf-8")), filepath)
+
+
+def load_mappings(filepath: Path | None = None) -> MappingRegistry:
+    """Return the registry of `filepath`, `$ER_MAPPINGS` or the default config (cached)."""
+    if filepath is None:
+        filepath = Path(os.environ.get(MAPPINGS_ENV, MAPPINGS_JSON))
+    return _load(Path(filepath).resolve())
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mappings", type=Path, nargs="?", help="mappings config (default: $ER_MAPPINGS)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    registry = load_mappings(parse_args().mappings)
+    for key, value in registry.describe().items():
+        print(f"{key:>12}: {value}")
+    for group, codes in registry.department_groups.items():
+        print(f"{group:>12}: {', '.join(codes)}")
@@ -0,0 +1,85 @@
+"""Minimal DAG runner executing pipeline stages as soon as their dependencies finish."""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+import time
+
+
+@dataclass
+class Stage:
+    """A pipeline step.
+
+    `func` receives the results of the stages listed in `deps` as keyword
+    arguments named after them.
+    """
+    name: str
+    func: Callable[..., Any]
+    deps: list[str] = field(default_factory=list)
+
+
+def select_stages(stages: list[Stage], targets: list[str]) -> list[Stage]:
+    """Return the stages needed to produce `targets` (dependencies included)."""
+    by_name = {s.name: s for s in stages}
+    needed: set[str] = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise KeyError(f"Unknown stage: {name}")
+        if name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name].deps)
+    return [s for s in stages if s.name in needed]
+
+
+def _check_graph(stages: list[Stage]) -> None:
+    """Fail early on missing dependencies and cycles."""
+    names = {s.name for s in stages}
+    for stage in stages:
+        missing = set(stage.deps) - names
+        if missing:
+            raise ValueError(f"{stage.name} depends on unknown stages {sorted(missing)}")
+
+    done: set[str] = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if set(s.deps) <= done]
+        if not ready:
+            raise ValueError(f"Cycle between stages {[s.name for s in remaining]}")
+        done.update(s.name for s in ready)
+        remaining = [s for s in remaining if s.name not in done]
+
+
+def run_pipeline(stages: list[Stage], max_workers: int = 4, verbose: bool = True) -> dict[str, Any]:
+    """Run the stages concurrently, respecting their dependencies.
+
+    Independent stages (e.g. the analyses) overlap in a thread pool. The first
+    failing stage stops the scheduling of new stages and its error is raised.
+    """
+    _check_graph(stages)
+    results: dict[str, Any] = {}
+    remaining = {s.name: s for s in stages}
+    running: dict[Future, Stage] = {}
+    started: dict[str, float] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while remaining or running:
+            for stage in [s for s in remaining.values() if set(s.deps) <= results.keys()]:
+                del remaining[stage.name]
+                started[stage.name] = time.perf_counter()
+                kwargs = {dep: results[dep] for dep in stage.deps}
+                running[executor.submit(stage.func, **kwargs)] = stage
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    for other in running:
+                        other.cancel()
+                    raise RuntimeError(f"Stage {stage.name} failed") from error
+                results[stage.name] = future.result()
+                if verbose:
+                    elapsed = time.perf_counter() - started[stage.name]
+                    print(f"[{stage.name}] done in {elapsed:.1f}s", flush=True)
+    return results
@@ -3,143 +3,22 @@ from datetime import timedelta
 from pathlib import Path
 import pandas as pd
 
+from data_profiler import REPORTS_DIR, DataProfile
+from mappings import Lookup, MappingRegistry, load_mappings
+
 INPUT_CSV = Path("data/raw/source_data.csv")
 OUTPUT_CSV = Path("data/raw/filtered_data.csv")
 
-REMOVE_VALUES = [
-    "PS Gen AO CASERTA",
-    "IMMUNOEMATOLOGIA E CENTRO TRASFUSIONALE - AMBULATORIO (PER ESTERNI)",
-    "TERAPIA DEL DOLORE - AMBULATORIO",
-    "REPARTO AMBULATORIALE CHIRURGIA D'URGENZA",
-    "GERIATRIA - AMBULATORIO",
-    "STROKE UNIT - AMBULATORIO",
-    "CARDIOCHIRURGIA - AMBULATORIO",
-    "PEDIATRIA - AMBULATORIO",
-    "OSTETRICIA E GINECOLOGIA A DIREZIONE UNIVERSITARIA - AMBULATORIO",
-]
+MAPPINGS = load_mappings()
 
-RENAME_MAP = {
-    # Case & demographics
-    "ID": "case_id",
-    "PS": "emergency_room",
-    "Scheda_PS": "file_id",
-    "Sesso": "sex",
-    "Data_Nascita": "birthday",
-    "Comune_Res": "residence_city",
-    "Regione_Res": "residence_region",
-    "Mod_Arrivo": "arrival_method",
-    "Reparto": "department",
-    "eta_paziente": "age",
-    "etapaziente_ric": "age_group",
-    "Triage_Ingr": "triage_entry_severity",
-    "Triage_OUT": "triage_exit_severity",
-
-    # Core timestamps
-    "data_arrivo_tot": "registration_ts",
-    "Presa_In_Carico": "acceptancy_ts",
-    "data_dimissione_tot": "outcome_ts",
-
-    # Outcome
-    "Esito": "outcome_raw",
-
-    # DISCHARGE attributes
-    "Medico_Dimissione": "discharge_doctor",
-    "Diag_TXT": "discharge_diagnosis_description",
-    "Diagnosi_Classe": "discharge_diagnosis_class",
-    "Diagnosi_Codice": "discharge_diagnosis_code",
-
-    # VISIT and tests
-    "CODICE_RICHIESTA": "visit_code",
-    "DESCR_PRESTAZIONE": "visit_description",
-    "DESCR_EROGATORE": "test_department",
-    "DATA_INSERIMENTO_RICHIESTA": "request_visit_ts",
-    "DATA_PREVISTA_EROGAZIONE": "test_planned_ts",
-}
-
-TEST_DEPARTMENT_RENAMING_MAPPING = {
-    'LAB. ANALISI': 'TEST',
-    'RADIOLOGIA': 'RADIOLOGY_DEPT',
-    'U.O.S.D. NEURORADIOLOGIA': 'NEURORADIOLOGY',
-    'GASTROENTEROLOGIA - AMBULATORIO': 'GASTROENTEROLOGY',
-    'NEFROLOGIA - AMBULATORIO': 'NEPHROLOGY',
-    'DERMATOLOGIA E MALATTIE VENEREE - AMBULATORIO': 'DERMATOLOGY',
-    'MEDICINA INTERNA - AMBULATORIO': 'INTERNAL_MEDICINE',
-    'NEUROLOGIA - AMBULATORIO': 'NEUROLOGY',
-    'PNEUMOLOGIA FISIOPATOLOGIA RESPIRATORIA - AMBULATORIO': 'PULMONOLOGY',
-    'REPARTO AMBULATORIALE ALLERGOLOGIA': 'ALLERGOLOGY_AMB',
-    "CARDIOLOGIA D'EMERGENZA CON UTIC - AMBULATORIO": 'EMERGENCY_CARDIOLOGY_UTIC',
-    'MALATTIE  INFETTIVE E TROPICALI A DIREZIONE UNIVERSITARIA - AMBULATORIO - EROGAZIONE FARMACI PER ESTERNI': 'INFECTIOUS_DISEASES_PHARMACY',
-    'Eliot': 'ELIOT_TRANSFUSION',
-    'NEUROCHIRURGIA - AMBULATORIO': 'NEUROSURGERY',
-    'ORTOPEDIA E TRAUMATOLOGIA - AMBULATORIO': 'ORTHOPEDICS_TRAUMA',
-    'OTORINOLARINGOIATRIA - AMBULATORIO': 'ENT_OTOLARYNGOLOGY',
-    'UROLOGIA - AMBULATORIO': 'UROLOGY',
-    'REPARTO AMBULATORIALE CHIRURGIA VASCOLARE': 'VASCULAR_SURGERY_AMB',
-    'REPARTO AMBULATORIALE CH.MAX.ODONTOST.': 'MAXILLOFACIAL_SURGERY_AMB',
-    'REPARTO AMBULATORIALE ANESTESIA E RIANIMAZIONE': 'ANESTHESIA_RESUSCITATION_AMB',
-    'REPARTO AMBULATORIALE ONCOLOGIA': 'ONCOLOGY_GENERAL',
-    'CHIRURGIA GENERALE ED ONCOLOGICA - AMBULATORIO': 'ONCOLOGY_SURGERY',
-    'EMATOLOGIA AD INDIRIZZO ONCOLOGICO - AMBULATORIO': 'ONCOLOGY_HEMATOLOGY',
-    'FOLLOW UP DEL PAZIENTE POST ACUTO - AMBULATORIO': 'POST_ACUTE_FOLLOW_UP'
-}
-
-TEST_DEPARTMENT_GROUPING = {
-    "TESTS": ["TEST"],
-    "RADIOLOGY": [
-        "RADIOLOGY_DEPT",
-        "NEURORADIOLOGY"],
-    "MEDICAL": [
-        "GASTROENTEROLOGY",
-        "NEPHROLOGY",
-        "DERMATOLOGY",
-        "INTERNAL_MEDICINE",
-        "NEUROLOGY",
-        "PULMONOLOGY",
-        "ALLERGOLOGY_AMB",
-        "EMERGENCY_CARDIOLOGY_UTIC",
-        "INFECTIOUS_DISEASES_PHARMACY",
-        "ELIOT_TRANSFUSION"],
-    "SURGERY": [
-        "NEUROSURGERY",
-        "ORTHOPEDICS_TRAUMA",
-        "ENT_OTOLARYNGOLOGY",
-        "UROLOGY",
-        "VASCULAR_SURGERY_AMB",
-        "MAXILLOFACIAL_SURGERY_AMB"],
-    "INTENSIVE": ["ANESTHESIA_RESUSCITATION_AMB"],
-    "ONCOLOGY": [
-        "ONCOLOGY_GENERAL",
-        "ONCOLOGY_SURGERY",
-        "ONCOLOGY_HEMATOLOGY"],
-    "FOLLOW_UP": ["POST_ACUTE_FOLLOW_UP"],
-}
-
-TEST_DEPARTMENT_AVERAGE_TIME = {
-    "TEST": 10,
-    "RADIOLOGY_DEPT": 20,
-    "NEURORADIOLOGY": 40,
-    "GASTROENTEROLOGY": 25,
-    "NEPHROLOGY": 25,
-    "DERMATOLOGY": 25,
-    "INTERNAL_MEDICINE": 25,
-    "NEUROLOGY": 30,
-    "PULMONOLOGY": 25,
-    "ALLERGOLOGY_AMB": 25,
-    "EMERGENCY_CARDIOLOGY_UTIC": 30,
-    "INFECTIOUS_DISEASES_PHARMACY": 25,
-    "ELIOT_TRANSFUSION": 60,
-    "NEUROSURGERY": 30,
-    "ORTHOPEDICS_TRAUMA": 25,
-    "ENT_OTOLARYNGOLOGY": 25,
-    "UROLOGY": 25,
-    "VASCULAR_SURGERY_AMB": 25,
-    "MAXILLOFACIAL_SURGERY_AMB": 25,
-    "ANESTHESIA_RESUSCITATION_AMB": 30,
-    "ONCOLOGY_GENERAL": 30,
-    "ONCOLOGY_SURGERY": 30,
-    "ONCOLOGY_HEMATOLOGY": 30,
-    "POST_ACUTE_FOLLOW_UP": 30,
-}
+# Aliases of the shared mapping tables (see config/mappings.json)
+REMOVE_VALUES = MAPPINGS.excluded_departments
+RENAME_MAP = MAPPINGS.columns
+TEST_DEPARTMENT_RENAMING_MAPPING = MAPPINGS.department_names
+TEST_DEPARTMENT_GROUPING = MAPPINGS.department_groups
+TEST_DEPARTMENT_AVERAGE_TIME = MAPPINGS.department_average_time
+OUTCOME_MAP = MAPPINGS.outcomes
+SEVERITY_MAP = MAPPINGS.severities
 
 TIMESTAMP_COLUMNS = [
     "registration_ts",
@@ -149,27 +28,6 @@ TIMESTAMP_COLUMNS = [
     "request_visit_ts",
 ]
 
-OUTCOME_MAP = {
-    "Rifiuta ricovero": "REFUSED_ADMISSION",
-    "Dimissione a strutture ambulatoriali": "OUTPATIENT_DISCHARGE",
-    "Ricovero": "ADMITTED",
-    "Dimissione a domicilio": "HOME_DISCHARGE",
-    "Abbandona prima della chiusura della cartella": "LEFT_EARLY",
-    "Trasferito ad altro Ospedale": "HOSPITAL_TRANSFER",
-    "Deceduto in PS": "DIED_ER",
-    "Trasferito in struttura territoriale": "LOCAL_TRANSFER",
-    "Giunto cadavere": "ARRIVED_DEAD",
-}
-
-SEVERITY_MAP = {
-    "Arancione": "ORANGE",
-    "Azzurro": "BLUE",
-    "Bianco": "WHITE",
-    "Nero": "BLACK",
-    "Rosso": "RED",
-    "Verde": "GREEN",
-}
-
 
 def load_data(filepath: Path) -> pd.DataFrame:
     """Load CSV data from the given path."""
@@ -216,39 +74,35 @@ def rename_columns(df: pd.DataFrame, rename_map: dict[str, str]) -> pd.DataFrame
     return df.rename(columns=rename_map)
 
 
-def translate_test_department(df: pd.DataFrame, translation_map: dict[str, str]) -> pd.DataFrame:
-    """Translate department names to english accorging to the given mapping. """
-    return df.replace(translation_map)
+def translate_test_department(df: pd.DataFrame, translation: Lookup) -> pd.DataFrame:
+    """Translate department names to english in every text column, keeping the unknown values."""
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        df[col] = translation.map(df[col], keep_unmapped=True)
+    return df
 
 
-def add_department_average_time(df: pd.DataFrame, average_time_map: dict[str, int]) -> pd.DataFrame:
+def add_department_average_time(df: pd.DataFrame, average_time: Lookup) -> pd.DataFrame:
     """Add the average visit time based on the department."""
-    df["average_visit_time"] = df["test_department"].map(average_time_map)
+    df["average_visit_time"] = average_time.map(df["test_department"])
     return df
 
 
-def create_test_department_group(df: pd.DataFrame, group_map: dict[str, str]) -> pd.DataFrame:
-    """Create test department groups based on the given group map. """
-    # invert the mapping so each value maps to its group
-    value_to_group = {
-        value: group
-        for group, values in group_map.items()
-        for value in values
-    }
-    df["test_department_group"] = df["test_department"].map(value_to_group)
+def create_test_department_group(df: pd.DataFrame, groups: Lookup) -> pd.DataFrame:
+    """Create test department groups from the translated department names."""
+    df["test_department_group"] = groups.map(df["test_department"])
     return df
 
 
-def map_outcome_values(df: pd.DataFrame) -> pd.DataFrame:
+def map_outcome_values(df: pd.DataFrame, outcomes: Lookup = MAPPINGS.outcome_lookup) -> pd.DataFrame:
     """Map Italian outcome descriptions to English ones."""
-    df["outcome_raw"] = df["outcome_raw"].map(OUTCOME_MAP)
+    df["outcome_raw"] = outcomes.map(df["outcome_raw"])
     return df
 
 
-def map_triage_severity_values(df: pd.DataFrame):
+def map_triage_severity_values(df: pd.DataFrame, severities: Lookup = MAPPINGS.severity_lookup):
     """Map Italian triage severity descriptions to English ones."""
-    df["triage_entry_severity"] = df["triage_entry_severity"].map(SEVERITY_MAP)
-    df["triage_exit_severity"] = df["triage_exit_severity"].map(SEVERITY_MAP)
+    df["triage_entry_severity"] = severities.map(df["triage_entry_severity"])
+    df["triage_exit_severity"] = severities.map(df["triage_exit_severity"])
     return df
 
 
@@ -310,34 +164,62 @@ def save_data(df: pd.DataFrame, filepath: Path) -> None:
     df.to_csv(filepath, index=False)
 
 
-def process_data(input_path: Path, output_path: Path) -> None:
-    """Execute the full filtering and cleaning pipeline."""
-    df = load_data(input_path)
+def _checkpoint(profile: DataProfile | None, rule: str, df: pd.DataFrame) -> None:
+    """Record the cases dropped by `rule`, if profiling."""
+    if profile is not None:
+        profile.checkpoint(rule, df)
+
+
+def preprocess(
+    df: pd.DataFrame,
+    profile: DataProfile | None = None,
+    mappings: MappingRegistry = MAPPINGS,
+) -> pd.DataFrame:
+    """Apply the full filtering and cleaning pipeline to the raw data.
+
+    When a `profile` is given, data quality statistics are gathered along the way.
+    """
     df = update_outcome_timestamp(df)
     df = update_arrival_timestamp(df)
     df = clean_strings(df)
-    df = rename_columns(df, RENAME_MAP)
-    df = filter_emergency_room(df)
-    df = drop_invalid_exams(df, REMOVE_VALUES)
-    df = filter_columns(df, list(RENAME_MAP.values()))
-    df = translate_test_department(
-        df,
-        TEST_DEPARTMENT_RENAMING_MAPPING
-    )
-    df = add_department_average_time(
-        df,
-        TEST_DEPARTMENT_AVERAGE_TIME
-    )
-    df = create_test_department_group(df, TEST_DEPARTMENT_GROUPING)
+    df = rename_columns(df, mappings.columns)
+    if profile is not None:
+        profile.start(df, mappings.describe())
+    df = filter_emergency_room(df, mappings.emergency_room)
+    _checkpoint(profile, "filter_emergency_room", df)
+    df = drop_invalid_exams(df, mappings.excluded_departments)
+    _checkpoint(profile, "drop_invalid_exams", df)
+    df = filter_columns(df, list(mappings.columns.values()))
+    df = translate_test_department(df, mappings.department_lookup)
+    df = add_department_average_time(df, mappings.average_time_lookup)
+    df = create_test_department_group(df, mappings.group_lookup)
     df = convert_timestamps(df, TIMESTAMP_COLUMNS)
     # df = update_ambulance_timestamps(df)
     df = add_synthetic_timestamps(df)
-    df = map_outcome_values(df)
-    df = map_triage_severity_values(df)
+    df = map_outcome_values(df, mappings.outcome_lookup)
+    df = map_triage_severity_values(df, mappings.severity_lookup)
+    if profile is not None:
+        profile.scan(df)
     df = dropna_by_column(df, column="triage_exit_severity")
+    _checkpoint(profile, "dropna_triage_exit_severity", df)
     df = drop_invalid_timestamps(df)
+    _checkpoint(profile, "drop_invalid_timestamps", df)
     df = drop_2024_records(df, TIMESTAMP_COLUMNS)
+    _checkpoint(profile, "drop_2024_records", df)
+    return df
+
+
+def process_data(input_path: Path, output_path: Path, reports_dir: Path | None = REPORTS_DIR) -> None:
+    """Execute the full filtering and cleaning pipeline.
+
+    The data quality report is written to `reports_dir` (skipped if None).
+    """
+    df = load_data(input_path)
+    profile = DataProfile() if reports_dir is not None else None
+    df = preprocess(df, profile)
     save_data(df, output_path)
+    if profile is not None:
+        profile.save(reports_dir)
 
 
 if __name__ == "__main__":
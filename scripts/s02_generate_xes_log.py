@@ -6,9 +6,17 @@ from pathlib import Path
 import math
 import datetime as dt
 import pandas as pd
-import pm4py
+from case_index import CASE_INDEX_PATH, build_case_index
+from event_store import EventStore
+from mappings import MappingRegistry, load_mappings
 
 INPUT_CSV = Path("data/raw/filtered_data.csv")
+ACTIVITY_INSTANCES_CSV = Path("output/activity_instances.csv")
+SKIPPED_CASES_CSV = Path("output/reports/skipped_cases.csv")
+
+
+class InvalidCaseError(ValueError):
+    """The rows of a case are inconsistent and cannot become a trace."""
 
 
 @dataclass
@@ -167,11 +175,44 @@ class DischargeEvent(BaseEvent):
         return result
 
 
+@dataclass
+class ActivityInstance:
+    """Lifecycle of a test/visit, recorded while its events are generated."""
+    case_id: str
+    activity: str
+    department: str
+    department_group: str
+    request_ts: dt.datetime
+    start_ts: dt.datetime
+    complete_ts: dt.datetime
+    # True when the synthetic start was moved to request_ts + 1s
+    start_clamped: bool
+
+    def to_dict(self) -> dict[str, any]:
+        """Return a flat dict with waiting and service times in minutes."""
+        request_ts = pd.to_datetime(self.request_ts)
+        start_ts = pd.to_datetime(self.start_ts)
+        complete_ts = pd.to_datetime(self.complete_ts)
+        return {
+            "case_id": self.case_id,
+            "activity": self.activity,
+            "department": self.department,
+            "department_group": self.department_group,
+            "request_ts": request_ts,
+            "start_ts": start_ts,
+            "complete_ts": complete_ts,
+            "waiting_time": (start_ts - request_ts).total_seconds() / 60,
+            "service_time": (complete_ts - start_ts).total_seconds() / 60,
+            "start_clamped": self.start_clamped,
+        }
+
+
 @dataclass
 class Case:
     """Class representing a Patient Case"""
     case_id: str
     events: list[BaseEvent] = field(default_factory=list)
+    activity_instances: list[ActivityInstance] = field(default_factory=list)
 
     def _normalize_timestamp(self, ts):
         """Ensure timestamp is a Python datetime, not a string."""
@@ -201,30 +242,62 @@ class Case:
 class EventLog:
     """Class representing the whole Log"""
     cases: list[Case] = field(default_factory=list)
+    # case_id -> reason, for the cases left out by build_event_log
+    skipped_cases: dict[str, str] = field(default_factory=dict)
 
     def to_dataframe(self) -> pd.DataFrame:
         """Flatten all cases into a single dataframe."""
         rows = [c.to_dataframe() for c in self.cases]
         return pd.concat(rows, ignore_index=True)
 
+    def activity_instances_dataframe(self) -> pd.DataFrame:
+        """Return the test/visit instances of all cases, one row per instance."""
+        return pd.DataFrame([
+            instance.to_dict()
+            for case in self.cases
+            for instance in case.activity_instances
+        ])
+
+    def skipped_cases_dataframe(self) -> pd.DataFrame:
+        """Return the skipped cases with the reason they were left out."""
+        return (
+            pd.Series(self.skipped_cases, name="reason", dtype=object)
+            .rename_axis("case_id")
+            .reset_index()
+        )
+
     def to_xes(self, filepath: str):
         """Export the log to XES using pm4py."""
-        df = self.to_dataframe()
+        write_xes(self.to_dataframe(), filepath)
 
-        # Replace NaN with pd.NA (so pm4py ignores missing values)
-        df = df.convert_dtypes()
+    def to_sqlite(self, filepath: Path) -> int:
+        """Bulk load the log into a SQLite event store, return the events count."""
+        store = EventStore(filepath)
+        try:
+            return store.load_event_log(self)
+        finally:
+            store.close()
 
-        df = pm4py.format_dataframe(
-            df,
-            case_id="case:concept:name",
-            activity_key="concept:name",
-            timestamp_key="time:timestamp"
-        )
 
-        # Drop pm4py internal columns
-        df = df.loc[:, ~df.columns.str.startswith("@@")]
+def write_xes(df: pd.DataFrame, filepath: str):
+    """Export a flattened event dataframe to XES using pm4py."""
+    # pm4py is slow to import, load it only when exporting
+    import pm4py  # pylint: disable=import-outside-toplevel
+
+    # Replace NaN with pd.NA (so pm4py ignores missing values)
+    df = df.convert_dtypes()
 
-        pm4py.write_xes(df, filepath)
+    df = pm4py.format_dataframe(
+        df,
+        case_id="case:concept:name",
+        activity_key="concept:name",
+        timestamp_key="time:timestamp"
+    )
+
+    # Drop pm4py internal columns
+    df = df.loc[:, ~df.columns.str.startswith("@@")]
+
+    pm4py.write_xes(df, filepath)
 
 
 def load_data(filepath: Path) -> pd.DataFrame:
@@ -232,143 +305,195 @@ def load_data(filepath: Path) -> pd.DataFrame:
     return pd.read_csv(filepath, low_memory=False)
 
 
-def get_unique_from_df(df: pd.DataFrame, key: str, disable_assert: bool = False):
+def get_unique_from_df(df: pd.DataFrame, key: str, allow_multiple: bool = False):
     """Return the unique value from the dataframe."""
     value = {e[key] for _, e in df.iterrows()}
-    if not disable_assert:
-        assert len(value) == 1, f"More than one {key}: {value}! DF: {df!r}"
+    if len(value) != 1 and not allow_multiple:
+        # Only the case and the column: the reason ends up in skipped_cases.csv
+        case_id = df["case_id"].iloc[0] if "case_id" in df.columns and len(df) else "?"
+        raise InvalidCaseError(f"{case_id}: more than one {key}: {sorted(map(str, value))}")
     return value.pop()
 
 
-if __name__ == "__main__":
-    dataframe = load_data(INPUT_CSV)
-
-    log = EventLog()
-    cases = dataframe.groupby('case_id')
-    for case_id, event_df in cases:
-        case = Case(case_id, [])
-
-        registration_ts = get_unique_from_df(event_df, "registration_ts")
-        triage_entry_ts = get_unique_from_df(event_df, "triage_entry_ts")
-        acceptancy_ts = get_unique_from_df(event_df, "acceptancy_ts")
-        outcome_ts = get_unique_from_df(event_df, "outcome_ts")
-        triage_exit_ts = get_unique_from_df(event_df, "triage_exit_ts")
-        discharge_ts = get_unique_from_df(event_df, "discharge_ts")
-
-        # registration_ts_complete = get_unique_from_df(
-        #     event_df,
-        #     "registration_ts_complete"
-        # )
-
-        triage_entry_severity = get_unique_from_df(
-            event_df,
-            "triage_entry_severity"
-        )
-        triage_exit_severity = get_unique_from_df(
-            event_df,
-            "triage_exit_severity"
-        )
-
-        assert registration_ts < triage_entry_ts, f"{case_id}: {registration_ts} >= {acceptancy_ts}"
-        assert triage_entry_ts < acceptancy_ts, f"{case_id}: {triage_entry_ts} >= {acceptancy_ts}"
-        assert acceptancy_ts < triage_exit_ts, f"{case_id}: {acceptancy_ts} >= {triage_exit_ts}"
-
-        # REGISTRATION EVENT
-        arrival_method = get_unique_from_df(event_df, "arrival_method")
-        case.add_event(RegistrationEvent(case_id, registration_ts, arrival_method))
-        # if registration_ts_complete == registration_ts:
-        #     case.add_event(RegistrationEvent(case_id, registration_ts, arrival_method))
-        # else:
-        #     case.add_events([
-        #         RegistrationEvent(case_id, registration_ts, arrival_method, "start"),
-        #         RegistrationEvent(case_id, registration_ts_complete, arrival_method, "complete")
-        #     ])
-
-        # TRIAGE ENTRY EVENT
-        triage_entry = StartTriageEntryEvent(case_id, triage_entry_ts, triage_entry_severity)
-        case.add_event(triage_entry)
-
-        # ACCEPTANCY EVENT
-        acceptancy = AcceptancyEvent(case_id, acceptancy_ts)
-        case.add_event(acceptancy)
-
-        test_and_visits = event_df.groupby([
-            # "test_planned_ts",
-            "request_visit_ts",
-            "visit_code",
-            "test_department"
-        ])
-        
-        first_test = True
-        for index, tv_df in test_and_visits:
-            request_visit_ts = get_unique_from_df(tv_df, "request_visit_ts")
-            complete_ts = get_unique_from_df(tv_df, "test_planned_ts", disable_assert=True)
-            start_ts = pd.to_datetime(complete_ts) - timedelta(minutes=int(get_unique_from_df(tv_df, "average_visit_time")))
-            if start_ts <= pd.to_datetime(request_visit_ts):
-                start_ts = pd.to_datetime(request_visit_ts) + timedelta(seconds=1)
-            code = get_unique_from_df(tv_df, "visit_code")
-            desc = ",".join([tv["visit_description"] for _, tv in tv_df.iterrows()])
-            department = get_unique_from_df(tv_df, "test_department")
-
-            if get_unique_from_df(tv_df, "test_department") == "TEST":
-                if first_test:
-                    #  TEST INITIAL EVENT
-                    case.add_events([
-                        TestInitialEvent(case_id, start_ts, code, desc, department, "start"),
-                        TestInitialEvent(case_id, complete_ts, code, desc, department, "complete")
-                    ])
-                    first_test = False
-                else:
-                    #  TEST FOLLOW UP EVENT
-                    case.add_events([
-                        TestFollowUpEvent(case_id, start_ts, code, desc, department, "start"),
-                        TestFollowUpEvent(case_id, complete_ts, code, desc, department, "complete")
-                    ])
+def build_case(case_id, event_df: pd.DataFrame, laboratory_department: str) -> Case:
+    """Build the Case of a patient from its rows of the filtered data.
+
+    The tests of `laboratory_department` become TEST_* events, the others visits.
+    """
+    case = Case(case_id, [])
+
+    registration_ts = get_unique_from_df(event_df, "registration_ts")
+    triage_entry_ts = get_unique_from_df(event_df, "triage_entry_ts")
+    acceptancy_ts = get_unique_from_df(event_df, "acceptancy_ts")
+    outcome_ts = get_unique_from_df(event_df, "outcome_ts")
+    triage_exit_ts = get_unique_from_df(event_df, "triage_exit_ts")
+    discharge_ts = get_unique_from_df(event_df, "discharge_ts")
+
+    # registration_ts_complete = get_unique_from_df(
+    #     event_df,
+    #     "registration_ts_complete"
+    # )
+
+    triage_entry_severity = get_unique_from_df(
+        event_df,
+        "triage_entry_severity"
+    )
+    triage_exit_severity = get_unique_from_df(
+        event_df,
+        "triage_exit_severity"
+    )
+
+    if not registration_ts < triage_entry_ts:
+        raise InvalidCaseError(f"{case_id}: {registration_ts} >= {triage_entry_ts}")
+    if not triage_entry_ts < acceptancy_ts:
+        raise InvalidCaseError(f"{case_id}: {triage_entry_ts} >= {acceptancy_ts}")
+    if not acceptancy_ts < triage_exit_ts:
+        raise InvalidCaseError(f"{case_id}: {acceptancy_ts} >= {triage_exit_ts}")
+
+    # REGISTRATION EVENT
+    arrival_method = get_unique_from_df(event_df, "arrival_method")
+    case.add_event(RegistrationEvent(case_id, registration_ts, arrival_method))
+    # if registration_ts_complete == registration_ts:
+    #     case.add_event(RegistrationEvent(case_id, registration_ts, arrival_method))
+    # else:
+    #     case.add_events([
+    #         RegistrationEvent(case_id, registration_ts, arrival_method, "start"),
+    #         RegistrationEvent(case_id, registration_ts_complete, arrival_method, "complete")
+    #     ])
+
+    # TRIAGE ENTRY EVENT
+    triage_entry = StartTriageEntryEvent(case_id, triage_entry_ts, triage_entry_severity)
+    case.add_event(triage_entry)
+
+    # ACCEPTANCY EVENT
+    acceptancy = AcceptancyEvent(case_id, acceptancy_ts)
+    case.add_event(acceptancy)
+
+    test_and_visits = event_df.groupby([
+        # "test_planned_ts",
+        "request_visit_ts",
+        "visit_code",
+        "test_department"
+    ])
+    
+    first_test = True
+    for index, tv_df in test_and_visits:
+        request_visit_ts = get_unique_from_df(tv_df, "request_visit_ts")
+        complete_ts = get_unique_from_df(tv_df, "test_planned_ts", allow_multiple=True)
+        start_ts = pd.to_datetime(complete_ts) - timedelta(minutes=int(get_unique_from_df(tv_df, "average_visit_time")))
+        start_clamped = start_ts <= pd.to_datetime(request_visit_ts)
+        if start_clamped:
+            start_ts = pd.to_datetime(request_visit_ts) + timedelta(seconds=1)
+        code = get_unique_from_df(tv_df, "visit_code")
+        desc = ",".join([tv["visit_description"] for _, tv in tv_df.iterrows()])
+        department = get_unique_from_df(tv_df, "test_department")
+
+        if department == laboratory_department:
+            if first_test:
+                #  TEST INITIAL EVENT
+                activity = "TEST_INITIAL"
+                case.add_events([
+                    TestInitialEvent(case_id, start_ts, code, desc, department, "start"),
+                    TestInitialEvent(case_id, complete_ts, code, desc, department, "complete")
+                ])
+                first_test = False
             else:
-                name = f"VISIT_{get_unique_from_df(tv_df, 'test_department_group')}"
-                request_name = f"REQUEST_{name}"
-                case.add_event(RequestVisitEvent(case_id, request_name, request_visit_ts, code, desc, department))
+                #  TEST FOLLOW UP EVENT
+                activity = "TEST_FOLLOW_UP"
                 case.add_events([
-                    VisitEvent(case_id, name, start_ts, code, desc, department, "start"),
-                    VisitEvent(case_id, name, complete_ts, code, desc, department, "complete")
+                    TestFollowUpEvent(case_id, start_ts, code, desc, department, "start"),
+                    TestFollowUpEvent(case_id, complete_ts, code, desc, department, "complete")
                 ])
-
-        # OUCOME EVENT
-        outcome_value = get_unique_from_df(event_df, "outcome_raw")
-        outcome = OutcomeEvent(
-            case_id,
-            name=f"OUTCOME_{outcome_value}",
-            timestamp=outcome_ts
-        )
-        case.add_event(outcome)
-
-        # TRIAGE EXIT EVENT
-        triage_exit = StartTriageExitEvent(
-            case_id,
-            timestamp=triage_exit_ts,
-            severity=get_unique_from_df(event_df, "triage_exit_severity")
-        )
-        case.add_event(triage_exit)
-
-        ddcs = {e["discharge_diagnosis_code"] for _, e in event_df.iterrows()}
-        ddc = ddcs.pop()
-        diagnosis_code = int(ddc) if not math.isnan(ddc) else -1
-        # DISCHARGE EVENT
-        discharge = DischargeEvent(
+        else:
+            name = f"VISIT_{get_unique_from_df(tv_df, 'test_department_group')}"
+            request_name = f"REQUEST_{name}"
+            activity = name
+            case.add_event(RequestVisitEvent(case_id, request_name, request_visit_ts, code, desc, department))
+            case.add_events([
+                VisitEvent(case_id, name, start_ts, code, desc, department, "start"),
+                VisitEvent(case_id, name, complete_ts, code, desc, department, "complete")
+            ])
+
+        case.activity_instances.append(ActivityInstance(
             case_id,
-            diagnosis_description=get_unique_from_df(
-                event_df,
-                "discharge_diagnosis_description"
-            ),
-            diagnosis_class=get_unique_from_df(
-                event_df,
-                "discharge_diagnosis_class"
-            ),
-            diagnosis_code=int(diagnosis_code),
-            timestamp=discharge_ts
-        )
-        case.add_event(discharge)
+            activity=activity,
+            department=department,
+            department_group=get_unique_from_df(tv_df, "test_department_group"),
+            request_ts=request_visit_ts,
+            start_ts=start_ts,
+            complete_ts=complete_ts,
+            start_clamped=bool(start_clamped),
+        ))
+
+    # OUCOME EVENT
+    outcome_value = get_unique_from_df(event_df, "outcome_raw")
+    outcome = OutcomeEvent(
+        case_id,
+        name=f"OUTCOME_{outcome_value}",
+        timestamp=outcome_ts
+    )
+    case.add_event(outcome)
+
+    # TRIAGE EXIT EVENT
+    triage_exit = StartTriageExitEvent(
+        case_id,
+        timestamp=triage_exit_ts,
+        severity=get_unique_from_df(event_df, "triage_exit_severity")
+    )
+    case.add_event(triage_exit)
+
+    ddcs = {e["discharge_diagnosis_code"] for _, e in event_df.iterrows()}
+    ddc = ddcs.pop()
+    diagnosis_code = int(ddc) if not math.isnan(ddc) else -1
+    # DISCHARGE EVENT
+    discharge = DischargeEvent(
+        case_id,
+        diagnosis_description=get_unique_from_df(
+            event_df,
+            "discharge_diagnosis_description"
+        ),
+        diagnosis_class=get_unique_from_df(
+            event_df,
+            "discharge_diagnosis_class"
+        ),
+        diagnosis_code=int(diagnosis_code),
+        timestamp=discharge_ts
+    )
+    case.add_event(discharge)
+    return case
+
+
+def build_event_log(
+    df: pd.DataFrame,
+    skip_invalid: bool = False,
+    mappings: MappingRegistry | None = None,
+) -> EventLog:
+    """Build the EventLog from the filtered data, one Case per case_id.
+
+    With `skip_invalid`, cases failing a consistency check are left out and
+    recorded in `EventLog.skipped_cases` instead of stopping the run.
+    `mappings` default to `load_mappings()`.
+    """
+    laboratory_department = (mappings or load_mappings()).laboratory_department
+    log = EventLog()
+    for case_id, event_df in df.groupby('case_id'):
+        try:
+            log.cases.append(build_case(case_id, event_df, laboratory_department))
+        except InvalidCaseError as error:
+            if not skip_invalid:
+                raise
+            log.skipped_cases[case_id] = str(error)
+    return log
 
-        log.cases.append(case)
 
+if __name__ == "__main__":
+    dataframe = load_data(INPUT_CSV)
+    build_case_index(dataframe).save(CASE_INDEX_PATH)
+
+    log = build_event_log(dataframe, skip_invalid=True)
+    if log.skipped_cases:
+        print(f"Skipped {len(log.skipped_cases)} inconsistent cases, see {SKIPPED_CASES_CSV}")
+        SKIPPED_CASES_CSV.parent.mkdir(parents=True, exist_ok=True)
+        log.skipped_cases_dataframe().to_csv(SKIPPED_CASES_CSV, index=False)
+    log.activity_instances_dataframe().to_csv(ACTIVITY_INSTANCES_CSV, index=False)
     log.to_xes("output/log.xes")
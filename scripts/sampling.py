@@ -0,0 +1,184 @@
+"""Reproducible case sampling of the filtered data, before any event is built.
+
+Sampling works on case ids, so the sub-log is built from the rows of the
+sampled cases only and a 1% sample costs about 1% of the full log.
+
+    uv run scripts/sampling.py --method stratified --by severity --fraction 0.01
+    uv run scripts/sampling.py --method variant --fraction 0.05 --full-log output/log.xes
+"""
+from pathlib import Path
+import argparse
+import numpy as np
+import pandas as pd
+
+from case_index import build_case_index
+from log_analysis import case_variants, directly_follows
+from s02_generate_xes_log import build_event_log, load_data
+from xes_index import read_log
+
+SAMPLE_XES = Path("output/sample_log.xes")
+DEFAULT_SEED = 0
+
+# Stratification keys accepted by `sample_cases`, as CaseIndex columns
+STRATA = {
+    "severity": "triage_entry_severity",
+    "outcome": "outcome_raw",
+    "department_group": "department_mask",
+}
+
+
+def _largest_remainder(weights: np.ndarray, total: int) -> np.ndarray:
+    """Split `total` proportionally to `weights` into integers summing to `total`."""
+    if total == 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    quotas = weights * total / weights.sum()
+    counts = np.floor(quotas).astype(np.int64)
+    remainders = np.argsort(-(quotas - counts), kind="stable")
+    counts[remainders[:total - counts.sum()]] += 1
+    return counts
+
+
+def _stratified(keys: np.ndarray, fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """Return the positions of a proportional sample of `round(n * fraction)` cases.
+
+    The budget is split across the strata by largest remainder. Every stratum
+    gets at least one case when the budget allows it, otherwise a warning is
+    printed and the rarest strata may be left out.
+    """
+    _, inverse, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+    total = max(1, int(round(len(keys) * fraction)))
+    if len(sizes) <= total:
+        # One case per stratum, the rest proportionally to the remaining cases
+        takes = 1 + _largest_remainder(sizes - 1, total - len(sizes))
+    else:
+        print(f"Warning: {len(sizes)} strata for a budget of {total} cases, "
+              "some strata are not represented")
+        takes = _largest_remainder(sizes, total)
+
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    selected = [
+        rng.choice(order[bounds[stratum]:bounds[stratum + 1]], size=take, replace=False)
+        for stratum, take in enumerate(takes)
+        if take
+    ]
+    return np.sort(np.concatenate(selected))
+
+
+def variant_keys(df: pd.DataFrame) -> pd.Series:
+    """Approximate the variant of every case from the filtered rows.
+
+    The key is the ordered sequence of department groups of the tests/visits
+    (grouped as in `s02_generate_xes_log`) plus the outcome, which determines
+    the activity sequence of the generated case.
+    """
+    requests = (
+        df.drop_duplicates(["case_id", "request_visit_ts", "visit_code", "test_department"])
+        .sort_values(["case_id", "request_visit_ts"], kind="stable")
+    )
+    sequences = requests.groupby("case_id")["test_department_group"].agg(
+        lambda groups: ",".join(groups.astype(str))
+    )
+    outcomes = df.groupby("case_id")["outcome_raw"].first().astype(str)
+    return sequences.reindex(outcomes.index, fill_value="") + "|" + outcomes
+
+
+def sample_cases(
+    df: pd.DataFrame,
+    fraction: float,
+    method: str = "uniform",
+    by: str | None = None,
+    seed: int = DEFAULT_SEED,
+) -> np.ndarray:
+    """Return the ids of a reproducible sample of the cases in the filtered data.
+
+    `method` is "uniform", "stratified" (by one of `STRATA`) or "variant"
+    (every approximate variant keeps at least one case when the budget allows).
+    The sample always has `round(n * fraction)` cases (at least one).
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"fraction must be in (0, 1], got {fraction}")
+    rng = np.random.default_rng(seed)
+
+    if method == "uniform":
+        case_ids = np.sort(df["case_id"].unique())
+        take = max(1, int(round(len(case_ids) * fraction)))
+        return np.sort(rng.choice(case_ids, size=take, replace=False))
+    if method == "stratified":
+        if by not in STRATA:
+            raise ValueError(f"Stratified sampling needs --by in {sorted(STRATA)}")
+        index = build_case_index(df)
+        column = STRATA[by]
+        keys = index.department_mask if column == "department_mask" else index.codes[column]
+        return index.case_ids[_stratified(keys, fraction, rng)]
+    if method == "variant":
+        keys = variant_keys(df)
+        return keys.index.to_numpy()[_stratified(keys.to_numpy(), fraction, rng)]
+    raise ValueError(f"Unknown sampling method: {method}")
+
+
+def subsample(df: pd.DataFrame, case_ids: np.ndarray) -> pd.DataFrame:
+    """Return the filtered rows of the sampled cases."""
+    return df[df["case_id"].isin(case_ids)]
+
+
+def representativeness(full_events: pd.DataFrame, sample_events: pd.DataFrame) -> dict:
+    """Compare a sampled event log with the full one.
+
+    Edge coverage is the share of directly-follows edges of the full log
+    seen in the sample (also weighted by edge frequency); the severity
+    distance is the total variation distance of the triage severities.
+    """
+    full_dfg = directly_follows(full_events).set_index(["source", "target"])["frequency"]
+    sample_dfg = directly_follows(sample_events).set_index(["source", "target"])["frequency"]
+    covered = full_dfg.index.isin(sample_dfg.index)
+
+    full_variants = set(case_variants(full_events))
+    sample_variants = set(case_variants(sample_events))
+
+    def severity_share(events: pd.DataFrame) -> pd.Series:
+        return events["triage_entry_severity"].dropna().value_counts(normalize=True)
+
+    full_share, sample_share = severity_share(full_events), severity_share(sample_events)
+    distance = full_share.sub(sample_share, fill_value=0).abs().sum() / 2
+
+    return {
+        "cases": int(sample_events["case:concept:name"].nunique()),
+        "case_share": sample_events["case:concept:name"].nunique()
+        / full_events["case:concept:name"].nunique(),
+        "dfg_edge_coverage": float(covered.mean()),
+        "dfg_weighted_coverage": float(full_dfg[covered].sum() / full_dfg.sum()),
+        "variant_coverage": len(full_variants & sample_variants) / len(full_variants),
+        "severity_distance": float(distance),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=Path("data/raw/filtered_data.csv"))
+    parser.add_argument("--method", choices=["uniform", "stratified", "variant"], default="uniform")
+    parser.add_argument("--by", choices=sorted(STRATA), help="stratification key")
+    parser.add_argument("--fraction", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", type=Path, default=SAMPLE_XES, help="sampled XES log")
+    parser.add_argument("--full-log", type=Path, help="full XES log to measure representativeness")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    filtered = load_data(arguments.input)
+    sampled_ids = sample_cases(
+        filtered, arguments.fraction, arguments.method, arguments.by, arguments.seed
+    )
+    total_cases = filtered["case_id"].nunique()
+    print(f"Sampled {len(sampled_ids)} of {total_cases} cases "
+          f"(effective fraction {len(sampled_ids) / total_cases:.4f})")
+    sample_log = build_event_log(subsample(filtered, sampled_ids), skip_invalid=True)
+    sample_log.to_xes(str(arguments.output))
+    print(f"Sampled {len(sample_log.cases)} cases into {arguments.output}")
+    if arguments.full_log:
+        report = representativeness(read_log(arguments.full_log), sample_log.to_dataframe())
+        for metric, value in report.items():
+            print(f"{metric:>24}: {value:.4f}" if isinstance(value, float) else f"{metric:>24}: {value}")
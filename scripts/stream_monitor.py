@@ -0,0 +1,318 @@
+"""Online ER monitor consuming events shaped like `BaseEvent.to_dict()`.
+
+Sources:
+    tail    follow a JSON-lines file as it grows
+    listen  accept JSON lines on a TCP socket (stand-in for the hospital feed)
+    replay  feed an existing log (.csv / .xes) at N times the real speed
+"""
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import asyncio
+import datetime as dt
+import json
+import math
+import time
+import pandas as pd
+
+from xes_index import read_log
+
+SNAPSHOT_QUANTILES = (0.5, 0.9, 0.95)
+MAX_OPEN_CASES = 50_000
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with bounded relative error.
+
+    Values are counted in buckets growing geometrically by `gamma`, so every
+    quantile is returned within `relative_accuracy` of the true value while
+    memory stays bounded by `max_buckets` (lowest buckets are merged first).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: dict[int, int] = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Add a (non negative) value to the sketch."""
+        self.count += 1
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+        self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+        if len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> float | None:
+        """Return the approximate `q` quantile, None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+@dataclass
+class CaseState:
+    """What the monitor remembers about a case still in the ER."""
+    registration_ts: dt.datetime
+    severity: str | None = None
+    in_progress: dict[tuple[str, str], int] = field(default_factory=dict)
+
+
+@dataclass
+class ERMonitor:
+    """Running ER KPIs updated one event at a time in bounded memory."""
+    max_open_cases: int = MAX_OPEN_CASES
+    open_cases: OrderedDict = field(default_factory=OrderedDict)
+    waiting_times: dict[str, QuantileSketch] = field(
+        default_factory=lambda: defaultdict(QuantileSketch)
+    )
+    department_wip: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    events_seen: int = 0
+    evicted_cases: int = 0
+    clock: dt.datetime | None = None
+
+    def _close_case(self, case_id: str) -> None:
+        """Forget a case, releasing the department slots it still holds."""
+        state = self.open_cases.pop(case_id, None)
+        if state is None:
+            return
+        for (_, department), running in state.in_progress.items():
+            self.department_wip[department] -= running
+
+    def process(self, record: dict) -> None:
+        """Update the KPIs with a single event record."""
+        case_id = str(record["case:concept:name"])
+        name = record["concept:name"]
+        timestamp = _parse_timestamp(record["time:timestamp"])
+        self.events_seen += 1
+        self.clock = timestamp if self.clock is None else max(self.clock, timestamp)
+
+        if name == "REGISTRATION":
+            self.open_cases[case_id] = CaseState(timestamp)
+            if len(self.open_cases) > self.max_open_cases:
+                self._close_case(next(iter(self.open_cases)))
+                self.evicted_cases += 1
+            return
+
+        state = self.open_cases.get(case_id)
+        if state is None:
+            # Case registered before the monitor started (or evicted)
+            return
+
+        if name == "START_TRIAGE_ENTRY":
+            state.severity = record.get("triage_entry_severity")
+        elif name == "ACCEPTANCY":
+            waiting = (timestamp - state.registration_ts).total_seconds() / 60
+            self.waiting_times[state.severity or "UNKNOWN"].add(max(waiting, 0.0))
+        elif name == "DISCHARGE_EVENT":
+            self._close_case(case_id)
+        elif record.get("lifecycle:transition") in ("start", "complete"):
+            department = record.get("department") or "UNKNOWN"
+            key = (name, department)
+            if record["lifecycle:transition"] == "start":
+                state.in_progress[key] = state.in_progress.get(key, 0) + 1
+                self.department_wip[department] += 1
+            elif state.in_progress.get(key, 0) > 0:
+                state.in_progress[key] -= 1
+                self.department_wip[department] -= 1
+
+    def snapshot(self) -> dict:
+        """Return the current KPIs as a JSON serializable dict."""
+        return {
+            "clock": self.clock.isoformat() if self.clock else None,
+            "events_seen": self.events_seen,
+            "occupancy": len(self.open_cases),
+            "evicted_cases": self.evicted_cases,
+            "department_wip": {d: n for d, n in sorted(self.department_wip.items()) if n},
+            "waiting_time_minutes": {
+                severity: {
+                    "count": sketch.count,
+                    **{f"p{int(q * 100)}": sketch.quantile(q) for q in SNAPSHOT_QUANTILES},
+                }
+                for severity, sketch in sorted(self.waiting_times.items())
+            },
+        }
+
+    async def consume(self, source) -> None:
+        """Process every record produced by an async iterator."""
+        async for record in source:
+            self.process(record)
+
+
+def _parse_timestamp(value) -> dt.datetime:
+    """Accept datetimes and ISO strings (the JSON form of `to_dict()`)."""
+    if isinstance(value, dt.datetime):
+        return value
+    return dt.datetime.fromisoformat(str(value))
+
+
+def _to_json_line(record: dict) -> str:
+    """Serialize an event record, converting timestamps to ISO strings."""
+    return json.dumps(record, default=lambda v: v.isoformat()) + "\n"
+
+
+async def tail_file(filepath: Path, poll_interval: float = 0.5):
+    """Yield the JSON records appended to a file, like `tail -f`."""
+    with open(filepath, encoding="utf-8") as f:
+        # The producer may not have written the end of the last line yet
+        partial = ""
+        while True:
+            partial += f.readline()
+            if not partial.endswith("\n"):
+                await asyncio.sleep(poll_interval)
+                continue
+            line, partial = partial, ""
+            if line.strip():
+                yield json.loads(line)
+
+
+async def listen_socket(host: str, port: int, max_queue: int = 10_000):
+    """Yield the JSON records sent by any client connected to `host:port`."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async for line in reader:
+            if line.strip():
+                await queue.put(json.loads(line))
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        while True:
+            yield await queue.get()
+
+
+async def replay_events(df: pd.DataFrame, speed: float):
+    """Yield the events of a log in time order, `speed` times faster than real time.
+
+    A non positive speed replays the events as fast as possible.
+    """
+    df = df.sort_values("time:timestamp", kind="stable")
+    columns = list(df.columns)
+    wall_start = time.monotonic()
+    log_start = None
+    for values in df.itertuples(index=False, name=None):
+        record = {k: v for k, v in zip(columns, values) if not _is_missing(v)}
+        timestamp = _parse_timestamp(record["time:timestamp"])
+        record["time:timestamp"] = timestamp
+        if speed > 0:
+            log_start = log_start or timestamp
+            due = (timestamp - log_start).total_seconds() / speed
+            delay = due - (time.monotonic() - wall_start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        yield record
+
+
+async def send_events(source, host: str, port: int) -> int:
+    """Forward the records of `source` to a listening monitor; return the count."""
+    _, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    async for record in source:
+        writer.write(_to_json_line(record).encode("utf-8"))
+        sent += 1
+        if sent % 1000 == 0:
+            await writer.drain()
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+def _is_missing(value) -> bool:
+    """True for NaN / NA cells, which are not part of the event record."""
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def load_events(filepath: Path) -> pd.DataFrame:
+    """Load a flattened event log from CSV or XES."""
+    if filepath.suffix == ".xes":
+        return read_log(filepath)
+    df = pd.read_csv(filepath, low_memory=False)
+    df["time:timestamp"] = pd.to_datetime(df["time:timestamp"], format="ISO8601")
+    return df
+
+
+async def _report(monitor: ERMonitor, interval: float) -> None:
+    """Print a snapshot every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps(monitor.snapshot()), flush=True)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the monitor on the source selected on the command line."""
+    if args.source == "replay" and args.to:
+        host, port = args.to.rsplit(":", 1)
+        events = load_events(Path(args.path))
+        started = time.monotonic()
+        sent = await send_events(replay_events(events, args.speed), host, int(port))
+        elapsed = time.monotonic() - started
+        print(f"Sent {sent} events in {elapsed:.1f}s ({sent / elapsed:.0f} events/s)")
+        return
+
+    if args.source == "tail":
+        source = tail_file(Path(args.path))
+    elif args.source == "listen":
+        source = listen_socket(args.host, args.port)
+    else:
+        source = replay_events(load_events(Path(args.path)), args.speed)
+
+    monitor = ERMonitor()
+    reporter = asyncio.create_task(_report(monitor, args.interval))
+    started = time.monotonic()
+    try:
+        await monitor.consume(source)
+    finally:
+        reporter.cancel()
+        elapsed = time.monotonic() - started
+        print(json.dumps(monitor.snapshot()))
+        print(f"Processed {monitor.events_seen} events in {elapsed:.1f}s "
+              f"({monitor.events_seen / max(elapsed, 1e-9):.0f} events/s)")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="source", required=True)
+
+    tail = subparsers.add_parser("tail", help="follow a JSON-lines file")
+    tail.add_argument("path")
+
+    listen = subparsers.add_parser("listen", help="accept JSON lines on a TCP socket")
+    listen.add_argument("--host", default="127.0.0.1")
+    listen.add_argument("--port", type=int, default=8765)
+
+    replay = subparsers.add_parser("replay", help="replay an existing log")
+    replay.add_argument("path", help="event log (.csv or .xes)")
+    replay.add_argument("--speed", type=float, default=60.0,
+                        help="replay speed factor, 0 for as fast as possible")
+    replay.add_argument("--to", help="send to a listening monitor (host:port) instead")
+
+    for subparser in (tail, listen, replay):
+        subparser.add_argument("--interval", type=float, default=5.0,
+                               help="seconds between printed snapshots")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,206 @@
+"""Indexed reader for XES logs with random access by case.
+
+The first scan records the byte range of every `<trace>` in a sidecar file
+(`<log>.idx.npz`); afterwards single cases or ranges are parsed straight from
+a memory-mapped file. `read_log` also keeps a columnar pickle of the whole
+log (`<log>.cache.pkl`) so later sessions skip the XML parsing entirely.
+Both sidecars are stamped with the size and mtime of the XES file and are
+rebuilt when the stamp does not match; the pickle is a local artifact of
+this pipeline and is only unpickled after its header and stamp check out.
+
+    uv run scripts/xes_index.py output/log.xes --case 12345
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from xml.etree import ElementTree
+import argparse
+import mmap
+import os
+import re
+import numpy as np
+import pandas as pd
+
+TRACE_START = re.compile(rb"<trace[\s>]")
+TRACE_END = b"</trace>"
+CASE_NAME = re.compile(rb'key="concept:name"\s+value="([^"]*)"')
+# First line of `<log>.cache.pkl`, followed by the source stamp
+CACHE_FORMAT = "xes-index-cache-v1"
+
+XES_TYPES = {
+    "string": str,
+    "id": str,
+    "int": int,
+    "float": float,
+    "boolean": lambda value: value.lower() == "true",
+    "date": str,  # converted column-wise with pandas
+}
+
+
+def _sidecar(filepath: Path, suffix: str) -> Path:
+    return filepath.with_name(filepath.name + suffix)
+
+
+def _source_stamp(filepath: Path) -> list[int]:
+    """Size and mtime of a file, used to detect stale sidecars."""
+    stat = filepath.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _parse_attributes(element: ElementTree.Element, prefix: str = "") -> dict:
+    """Read the typed XES attributes directly below `element`."""
+    attributes = {}
+    for child in element:
+        convert = XES_TYPES.get(child.tag)
+        if convert is not None and "key" in child.attrib:
+            attributes[prefix + child.attrib["key"]] = convert(child.attrib.get("value", ""))
+    return attributes
+
+
+def parse_trace(chunk: bytes) -> list[dict]:
+    """Parse a `<trace>...</trace>` chunk into flat event rows."""
+    trace = ElementTree.fromstring(chunk)
+    case_attributes = _parse_attributes(trace, prefix="case:")
+    return [
+        {**case_attributes, **_parse_attributes(event)}
+        for event in trace.iter("event")
+    ]
+
+
+def _rows_to_dataframe(rows: list[dict]) -> pd.DataFrame:
+    """Build the event dataframe, converting the timestamp column."""
+    df = pd.DataFrame(rows)
+    if "time:timestamp" in df.columns:
+        df["time:timestamp"] = pd.to_datetime(df["time:timestamp"], format="ISO8601", utc=True)
+    return df
+
+
+@dataclass
+class XesIndex:
+    """Byte ranges of the traces of a XES file."""
+    filepath: Path
+    case_ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    def _read(self, positions) -> pd.DataFrame:
+        """Parse the traces at the given positions."""
+        rows = []
+        with open(self.filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for i in positions:
+                rows.extend(parse_trace(data[self.starts[i]:self.ends[i]]))
+        return _rows_to_dataframe(rows)
+
+    def load_case(self, case_id: str) -> pd.DataFrame:
+        """Return the events of a single case."""
+        return self.load_cases([case_id])
+
+    def load_cases(self, case_ids: list[str]) -> pd.DataFrame:
+        """Return the events of the given cases."""
+        wanted = np.isin(self.case_ids, [str(c) for c in case_ids])
+        if not wanted.any():
+            raise KeyError(f"No trace found for {case_ids}")
+        return self._read(np.flatnonzero(wanted))
+
+    def load_range(self, start: int, stop: int) -> pd.DataFrame:
+        """Return the events of the traces in positions [start, stop)."""
+        return self._read(range(start, min(stop, len(self))))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Parse the whole log."""
+        return self._read(range(len(self)))
+
+    def save(self) -> None:
+        """Store the index next to the XES file."""
+        np.savez(
+            _sidecar(self.filepath, ".idx.npz"),
+            case_ids=self.case_ids,
+            starts=self.starts,
+            ends=self.ends,
+            source=np.array(_source_stamp(self.filepath), dtype=np.int64),
+        )
+
+    @classmethod
+    def build(cls, filepath: Path) -> "XesIndex":
+        """Scan the XES file once, recording where every trace starts and ends."""
+        case_ids, starts, ends = [], [], []
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = 0
+            while (match := TRACE_START.search(data, position)) is not None:
+                start = match.start()
+                end = data.find(TRACE_END, start)
+                if end < 0:
+                    raise ValueError(f"Unterminated trace at byte {start} of {filepath}")
+                end += len(TRACE_END)
+                # The case name is written before the first event of the trace
+                header_end = data.find(b"<event", start, end)
+                name = CASE_NAME.search(data, start, header_end if header_end >= 0 else end)
+                case_ids.append(_unescape(name.group(1)) if name else "")
+                starts.append(start)
+                ends.append(end)
+                position = end
+        return cls(
+            filepath=filepath,
+            case_ids=np.array(case_ids, dtype=str),
+            starts=np.array(starts, dtype=np.int64),
+            ends=np.array(ends, dtype=np.int64),
+        )
+
+    @classmethod
+    def open(cls, filepath: Path) -> "XesIndex":
+        """Load the sidecar index, (re)building it if missing or stale."""
+        filepath = Path(filepath)
+        index_path = _sidecar(filepath, ".idx.npz")
+        if index_path.exists():
+            with np.load(index_path, allow_pickle=False) as data:
+                if list(data["source"]) == _source_stamp(filepath):
+                    return cls(filepath, data["case_ids"], data["starts"], data["ends"])
+        index = cls.build(filepath)
+        index.save()
+        return index
+
+
+def _unescape(value: bytes) -> str:
+    """Decode an XML attribute value."""
+    return ElementTree.fromstring(b'<a v="' + value + b'"/>').attrib["v"]
+
+
+def read_log(filepath: Path) -> pd.DataFrame:
+    """Return the whole log as a dataframe, using the columnar cache when fresh."""
+    filepath = Path(filepath)
+    cache_path = _sidecar(filepath, ".cache.pkl")
+    size, mtime = _source_stamp(filepath)
+    header = f"{CACHE_FORMAT} {size} {mtime}\n".encode("ascii")
+    if cache_path.exists():
+        with open(cache_path, "rb") as f:
+            # Anything else (older format, other source) is rebuilt, never unpickled
+            if f.readline() == header:
+                return pd.read_pickle(f)
+    df = XesIndex.open(filepath).to_dataframe()
+    partial = _sidecar(filepath, f".cache.pkl.{os.getpid()}")
+    with open(partial, "wb") as f:
+        f.write(header)
+        df.to_pickle(f)
+    partial.replace(cache_path)
+    return df
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="XES log")
+    parser.add_argument("--case", action="append", help="case id to print (repeatable)")
+    parser.add_argument("--cache", action="store_true", help="build the columnar cache")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    xes_index = XesIndex.open(arguments.path)
+    print(f"{len(xes_index)} traces indexed in {_sidecar(arguments.path, '.idx.npz')}")
+    if arguments.case:
+        print(xes_index.load_cases(arguments.case).to_string())
+    if arguments.cache:
+        print(f"{len(read_log(arguments.path))} events cached")